@@ -466,7 +466,7 @@ def get_community_manager():
     """Get or create the community manager singleton."""
     global _community_manager
     if _community_manager is None:
-        from services.manager import CommunityManager
+        from services.community import CommunityManager
 
         _community_manager = CommunityManager(bird_ctl=config.bird_ctl)
     return _community_manager
@@ -476,7 +476,7 @@ def get_latency_probe():
     """Get or create the latency probe singleton."""
     global _latency_probe
     if _latency_probe is None:
-        from services.latency_probe import LatencyProbe
+        from workers.latency_probe import LatencyProbe
 
         _latency_probe = LatencyProbe()
 
@@ -590,7 +590,7 @@ async def add_filter_rule(request):
     """
     data = await request.json()
 
-    from services.manager import FilterRule
+    from services.community import FilterRule
 
     rule = FilterRule(
         name=data.get("name", "unnamed"),
@@ -5,5 +5,14 @@ Configuration and shared utilities.
 """
 
 from .config import load_config
+from .files import atomic_write, write_private_file
+from .wgkeys import derive_public_key, generate_keypair, generate_private_key
 
-__all__ = ["load_config"]
+__all__ = [
+    "load_config",
+    "atomic_write",
+    "write_private_file",
+    "derive_public_key",
+    "generate_keypair",
+    "generate_private_key",
+]
@@ -0,0 +1,36 @@
+"""
+MoeNet DN42 Agent - File Helpers
+"""
+
+import os
+from pathlib import Path
+
+
+def atomic_write(path: Path, data: bytes, mode: int = 0o644) -> None:
+    """Replace path with data so readers never see a partially written file.
+
+    The data goes to a temp file next to path (created with `mode`, fsynced)
+    which is then renamed over path. The temp name starts with a dot and
+    doesn't end in .conf, so config globs never pick it up.
+    """
+    tmp = path.with_name(f".{path.name}.tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    try:
+        os.fchmod(fd, mode)  # os.open's mode is subject to the umask
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view) :]
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp, path)
+
+
+def write_private_file(path: Path, content: str) -> None:
+    """Write a file that must only be readable by the owner (mode 0600).
+
+    The file is created with mode 0600 from the start, so there is no window
+    where a private key is readable by others, and it replaces any existing
+    file that was created with looser permissions.
+    """
+    atomic_write(path, content.encode(), 0o600)
@@ -0,0 +1,46 @@
+"""
+MoeNet DN42 Agent - WireGuard Key Helpers
+
+Keys are generated in-process. Public keys are derived with the optional
+`cryptography` package (X25519) and fall back to `wg pubkey` without it.
+"""
+
+import base64
+import os
+import subprocess
+
+try:
+    from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey
+except ImportError:  # optional dependency, derive public keys via the wg binary
+    X25519PrivateKey = None
+
+
+def generate_private_key() -> str:
+    """Generate a WireGuard private key (same output format as `wg genkey`)."""
+    key = bytearray(os.urandom(32))
+    # Curve25519 clamping, as done by wg genkey
+    key[0] &= 248
+    key[31] = (key[31] & 127) | 64
+    return base64.b64encode(bytes(key)).decode()
+
+
+def derive_public_key(private_key: str) -> str:
+    """Derive the base64 public key for a base64 WireGuard private key."""
+    if X25519PrivateKey is not None:
+        raw = X25519PrivateKey.from_private_bytes(base64.b64decode(private_key))
+        return base64.b64encode(raw.public_key().public_bytes_raw()).decode()
+
+    result = subprocess.run(
+        ["wg", "pubkey"], input=private_key, capture_output=True, text=True, check=True
+    )
+    return result.stdout.strip()
+
+
+def generate_keypair() -> tuple[str, str]:
+    """Generate a new WireGuard key pair.
+
+    Returns:
+        Tuple of (private_key, public_key)
+    """
+    private_key = generate_private_key()
+    return private_key, derive_public_key(private_key)
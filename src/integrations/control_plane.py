@@ -2,13 +2,17 @@
 MoeNet DN42 Agent - Control Plane Client
 """
 
-import hashlib
 import json
 import logging
 from typing import Any, Optional
 
 import aiohttp
 
+try:
+    import orjson
+except ImportError:  # optional dependency, stdlib json is used instead
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
 
@@ -47,7 +51,8 @@ class ControlPlaneClient:
             url = f"{self.base_url}/api/v1/agent/config"
             async with session.get(url, params={"node": self.node_name}) as resp:
                 if resp.status == 200:
-                    return await resp.json()
+                    body = await resp.read()
+                    return orjson.loads(body) if orjson else json.loads(body)
                 logger.error(f"Failed to fetch config: HTTP {resp.status}")
                 return None
         except Exception as e:
@@ -179,8 +184,3 @@ class ControlPlaneClient:
         except Exception as e:
             logger.error(f"Registration error: {e}")
             return None
-
-    @staticmethod
-    def compute_config_hash(config: dict) -> str:
-        config_str = json.dumps(config.get("peers", []), sort_keys=True)
-        return f"sha256:{hashlib.sha256(config_str.encode()).hexdigest()[:16]}"
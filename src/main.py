@@ -14,22 +14,26 @@ import json
 import logging
 import os
 import signal
+import stat
 import sys
 from pathlib import Path
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from services.loopback import LoopbackExecutor
-from services.sync import SyncDaemon
-
 from core.config import load_config
+from core.files import atomic_write
 from integrations.control_plane import ControlPlaneClient
 from services.bird import BirdExecutor
-from services.ibgp import IBGPSync
-from services.mesh import MeshSync
+from services.network import LoopbackExecutor
 from services.wireguard import WireGuardExecutor
 from state.manager import StateManager
+from workers.sync_daemon import SyncDaemon
+
+try:
+    import orjson
+except ImportError:  # optional dependency, stdlib json is used instead
+    orjson = None
 
 # Configure logging
 logging.basicConfig(
@@ -45,11 +49,17 @@ def _persist_node_id(config_path: str, node_id: int) -> None:
     try:
         config_file = Path(config_path)
         if config_file.exists():
-            with open(config_file) as f:
-                data = json.load(f)
+            raw = config_file.read_bytes()
+            data = orjson.loads(raw) if orjson else json.loads(raw)
+            if data.get("node_id") == node_id:
+                return
             data["node_id"] = node_id
-            with open(config_file, "w") as f:
-                json.dump(data, f, indent=2)
+            # Atomic replace that keeps the file's mode: config.json holds API tokens
+            if orjson:
+                payload = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+            else:
+                payload = json.dumps(data, indent=2).encode()
+            atomic_write(config_file, payload, mode=stat.S_IMODE(config_file.stat().st_mode))
             logger.info(f"Persisted node_id={node_id} to {config_path}")
     except Exception as e:
         logger.warning(f"Failed to persist node_id: {e}")
@@ -110,9 +120,11 @@ def _get_public_ip(version: int = 4) -> str:
 
 async def main():
     """Main entry point."""
-    from aiohttp import web
-
-    from api.server import create_app
+    # Tasks that finish without blocking complete on creation instead of
+    # waiting for a loop iteration (eager_task_factory is Python 3.12+)
+    eager_task_factory = getattr(asyncio, "eager_task_factory", None)
+    if eager_task_factory is not None:
+        asyncio.get_running_loop().set_task_factory(eager_task_factory)
 
     # Load configuration (track path for persistence)
     config_path = os.environ.get("AGENT_CONFIG", "/opt/moenet-agent/config.json")
@@ -208,6 +220,10 @@ async def main():
         logger.error("Or manually set 'node_id' in config.json to a unique value (1-62).")
         sys.exit(1)  # Fail early instead of causing duplicate IP conflicts
 
+    # Deferred until node_id is known good: the fail-early exit above never needs them
+    from services.ibgp import IBGPSync
+    from services.mesh import MeshSync
+
     # Create mesh sync for IGP underlay (P2P mode)
     mesh_sync = MeshSync(
         client=client,
@@ -229,8 +245,10 @@ async def main():
     # Initialize mesh network (generate keys, register with CP)
     logger.info("Initializing mesh network...")
     try:
-        await mesh_sync.sync_mesh()
-        logger.info("✅ Mesh network initialized")
+        if await mesh_sync.sync_mesh():
+            logger.info("✅ Mesh network initialized")
+        else:
+            logger.warning("Mesh sync incomplete (will retry)")
     except Exception as e:
         logger.warning(f"Mesh sync failed (will retry): {e}")
 
@@ -254,8 +272,8 @@ async def main():
     latency_probe = None
     if getattr(config, "enable_latency_probe", True):
         try:
-            from services.latency_probe import LatencyProbe
-            from services.manager import CommunityManager
+            from services.community import CommunityManager
+            from workers.latency_probe import LatencyProbe
 
             latency_probe = LatencyProbe(
                 probe_interval=getattr(config, "latency_probe_interval", 300),
@@ -278,6 +296,10 @@ async def main():
             logger.warning(f"Latency probe initialization failed: {e}")
 
     # Create API server
+    from aiohttp import web
+
+    from api.server import create_app
+
     api_app = create_app()
     api_runner = web.AppRunner(api_app)
     await api_runner.setup()
@@ -308,9 +330,21 @@ async def main():
             await latency_probe.stop()
         await api_runner.cleanup()
         await client.close()
+        state_manager.save()  # flush updates still waiting on the save timer
 
     logger.info("MoeNet DN42 Agent stopped")
 
 
+def _install_event_loop_policy() -> None:
+    """Use uvloop for the event loop if it is installed (optional dependency)."""
+    try:
+        import uvloop
+    except ImportError:
+        return
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    logger.info("Using uvloop event loop")
+
+
 if __name__ == "__main__":
+    _install_event_loop_policy()
     asyncio.run(main())
@@ -8,10 +8,23 @@ TEMPLATE_DIR = Path(__file__).parent.parent.parent / "templates"
 
 
 class BirdRenderer:
+    __slots__ = ("env", "_peer_template")
+
     def __init__(self, template_dir: Path = TEMPLATE_DIR):
+        # Templates ship with the agent and don't change at runtime, so skip the
+        # per-render mtime check and keep the compiled template around
         self.env = Environment(
-            loader=FileSystemLoader(str(template_dir)), trim_blocks=True, lstrip_blocks=True
+            loader=FileSystemLoader(str(template_dir)),
+            trim_blocks=True,
+            lstrip_blocks=True,
+            auto_reload=False,
         )
+        self._peer_template = self.env.get_template("bird_peer.conf.j2")
 
     def render_peer(self, peer: dict) -> str:
-        return self.env.get_template("bird_peer.conf.j2").render(peer=peer)
+        return self._peer_template.render(peer=peer)
+
+    def render_peers(self, peers: list[dict]) -> dict[int, str]:
+        """Render several peers with the one compiled template (ASN -> config)."""
+        render = self._peer_template.render
+        return {peer["asn"]: render(peer=peer) for peer in peers}
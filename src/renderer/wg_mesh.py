@@ -12,11 +12,13 @@ Port allocation:
 - Example: peer node_id=1 -> port 51821, node_id=2 -> port 51822
 """
 
-import subprocess
 from pathlib import Path
 
 from jinja2 import Template
 
+from core.files import write_private_file
+from core.wgkeys import derive_public_key, generate_keypair
+
 # P2P mode: one interface per peer
 WG_MESH_P2P_TEMPLATE = """# WireGuard IGP Mesh - Auto-generated by MoeNet Agent
 # Interface: {{ interface_name }}
@@ -46,15 +48,7 @@ def generate_wg_keypair() -> tuple[str, str]:
     Returns:
         Tuple of (private_key, public_key)
     """
-    private_key = subprocess.run(
-        ["wg", "genkey"], capture_output=True, text=True, check=True
-    ).stdout.strip()
-
-    public_key = subprocess.run(
-        ["wg", "pubkey"], input=private_key, capture_output=True, text=True, check=True
-    ).stdout.strip()
-
-    return private_key, public_key
+    return generate_keypair()
 
 
 def get_or_create_mesh_key(key_path: Path) -> tuple[str, str]:
@@ -68,18 +62,14 @@ def get_or_create_mesh_key(key_path: Path) -> tuple[str, str]:
     """
     if key_path.exists():
         private_key = key_path.read_text().strip()
-        public_key = subprocess.run(
-            ["wg", "pubkey"], input=private_key, capture_output=True, text=True, check=True
-        ).stdout.strip()
-        return private_key, public_key
+        return private_key, derive_public_key(private_key)
 
     # Generate new key
     private_key, public_key = generate_wg_keypair()
 
     # Save private key
     key_path.parent.mkdir(parents=True, exist_ok=True)
-    key_path.write_text(private_key)
-    key_path.chmod(0o600)
+    write_private_file(key_path, private_key)
 
     return private_key, public_key
 
@@ -1,32 +1,70 @@
 """MoeNet DN42 Agent - WireGuard Renderer"""
 
+import os
+from functools import lru_cache
 from pathlib import Path
 
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template
 
 TEMPLATE_DIR = Path(__file__).parent.parent.parent / "templates"
+# Subdirectory of the systemd CacheDirectory= where compiled templates persist
+BYTECODE_CACHE_SUBDIR = "jinja2"
+
+
+def _bytecode_cache() -> FileSystemBytecodeCache | None:
+    """Return the on-disk bytecode cache, or None outside a writable systemd cache dir.
+
+    Only $CACHE_DIRECTORY (set by systemd for CacheDirectory=) is used, so
+    tests and manual runs never create directories under /var/cache.
+    """
+    cache_root = os.environ.get("CACHE_DIRECTORY", "").split(":")[0]
+    if not cache_root or not os.access(cache_root, os.W_OK):
+        return None
+    cache_dir = Path(cache_root) / BYTECODE_CACHE_SUBDIR
+    try:
+        cache_dir.mkdir(exist_ok=True)
+    except OSError:
+        return None
+    return FileSystemBytecodeCache(str(cache_dir))
+
+
+@lru_cache(maxsize=None)
+def _load_environment(template_dir: str) -> tuple[Environment, Template]:
+    """Build the environment and compiled template once per template dir."""
+    env = Environment(
+        loader=FileSystemLoader(template_dir),
+        trim_blocks=True,
+        lstrip_blocks=True,
+        auto_reload=False,
+        cache_size=-1,
+        bytecode_cache=_bytecode_cache(),
+    )
+    return env, env.get_template("wireguard.conf.j2")
 
 
 class WireGuardRenderer:
+    # AllowedIPs: Base set - all IPv4, IPv6 ULA, and link-local
+    BASE_ALLOWED_IPS = ("0.0.0.0/0", "fd00::/8", "fe80::/64")
+
+    __slots__ = ("env", "_interface_template")
+
     def __init__(self, template_dir: Path = TEMPLATE_DIR):
-        self.env = Environment(
-            loader=FileSystemLoader(str(template_dir)), trim_blocks=True, lstrip_blocks=True
-        )
+        # Shared by all instances; no mtime check per render (see BirdRenderer)
+        self.env, self._interface_template = _load_environment(str(template_dir))
 
     def render_interface(self, peer: dict, private_key: str, local_addr: str) -> str:
         tunnel = peer.get("tunnel", {})
         bgp = peer.get("bgp", {})
 
-        # AllowedIPs: Base set - all IPv4, IPv6 ULA, and link-local
-        allowed_ips = ["0.0.0.0/0", "fd00::/8", "fe80::/64"]
+        allowed_ips = self.BASE_ALLOWED_IPS
 
         # Add GUA (Global Unicast Address) if peer uses it
         peer_ipv6 = bgp.get("peer_ipv6", "")
         if peer_ipv6 and not peer_ipv6.startswith(("fe80::", "fd")):
             # This is a GUA address - add specific /128 for the peer
             # Strip any existing CIDR suffix first
-            addr = peer_ipv6.split("/")[0]
-            allowed_ips.append(f"{addr}/128")
+            addr = peer_ipv6.partition("/")[0]
+            allowed_ips = (*allowed_ips, f"{addr}/128")
 
         # Local addresses for WireGuard interface (our IPs)
         wg_local_addresses = []
@@ -39,7 +77,7 @@ class WireGuardRenderer:
 
         wg_local_addr = ", ".join(wg_local_addresses) if wg_local_addresses else None
 
-        return self.env.get_template("wireguard.conf.j2").render(
+        return self._interface_template.render(
             interface_name=f"dn42-{peer['asn']}",
             local_private_key=private_key,
             local_address=wg_local_addr,
@@ -49,3 +87,15 @@ class WireGuardRenderer:
             peer_endpoint=tunnel.get("endpoint"),
             allowed_ips=allowed_ips,
         )
+
+    def render_peers(self, peers: list[dict], private_key: str) -> dict[int, str]:
+        """Render interface configs for several peers (ASN -> config).
+
+        The local address falls back to each peer's bgp.request_lla.
+        """
+        return {
+            peer["asn"]: self.render_interface(
+                peer, private_key, peer.get("bgp", {}).get("request_lla", "")
+            )
+            for peer in peers
+        }
@@ -2,29 +2,57 @@
 
 Includes delayed coalesce reload mechanism to prevent BIRD 3.2.0 crash
 from rapid consecutive 'birdc configure' calls (assertion failure in conf.c:209).
+
+Talks to BIRD directly over its control socket (the same line protocol birdc
+uses) with one persistent connection, instead of forking birdc per command.
 """
 
 import logging
-import subprocess
+import socket
 import threading
+import time
 from pathlib import Path
+from typing import Optional
+
+from core.files import atomic_write
 
 logger = logging.getLogger(__name__)
 
 
+def _write_if_changed(path: Path, data: bytes) -> bool:
+    """Write data to path unless the file already holds exactly that content.
+
+    Returns:
+        True if the file was written
+    """
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+    atomic_write(path, data)
+    return True
+
+
 class BirdExecutor:
     """BIRD configuration executor with delayed coalesce reload.
 
     The reload() method uses a delayed coalesce pattern:
-    - Each call resets a timer (default 2 seconds)
-    - Only one actual reload happens after the timer expires
+    - Each call pushes the reload deadline back (default 2 seconds)
+    - Only one actual reload happens once the deadline passes
     - This prevents BIRD 3.2.0 crash from rapid consecutive configure calls
+
+    Deadlines are served by one long-lived worker thread, started on the
+    first reload() call, rather than a new Timer thread per call.
     """
 
     # Class-level shared state for singleton-like behavior across instances
-    _reload_timer: threading.Timer = None
     _reload_lock = threading.Lock()
+    _reload_event = threading.Event()  # set while a reload is pending
+    _reload_thread: threading.Thread = None
     _reload_pending = False
+    _reload_deadline = 0.0  # time.monotonic() at which the pending reload runs
+    _reload_executor: "BirdExecutor" = None  # instance whose socket performs it
     _coalesce_delay = 2.0  # seconds to wait before executing reload
 
     def __init__(
@@ -32,16 +60,122 @@ class BirdExecutor:
     ):
         self.config_dir = Path(config_dir)
         self.bird_ctl = bird_ctl
+        # Control socket connection, opened lazily on first command
+        self._sock: Optional[socket.socket] = None
+        self._sock_file = None
+        self._sock_lock = threading.Lock()
+
+    def _connect(self) -> None:
+        """Open the BIRD control socket and consume the greeting."""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(10)
+        try:
+            sock.connect(self.bird_ctl)
+            self._sock = sock
+            self._sock_file = sock.makefile("rb")
+            self._read_reply()  # "0001 BIRD x.y.z ready."
+        except OSError:
+            self._disconnect()
+            sock.close()
+            raise
+
+    def _disconnect(self) -> None:
+        """Drop the control socket connection (reopened on next command)."""
+        if self._sock_file is not None:
+            self._sock_file.close()
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = None
+        self._sock_file = None
+
+    def _read_reply(self) -> tuple[bytes, list[bytes]]:
+        """Read one reply from the control socket.
+
+        Reply lines are "CODE-text" (more follows), " text" (continuation of
+        the previous code) or "CODE text" (last line of the reply).
+
+        Lines are kept as bytes; callers decode only what they need to log.
+
+        Returns:
+            Tuple of (final reply code, text lines without code prefixes)
+        """
+        lines = []
+        while True:
+            raw = self._sock_file.readline()
+            if not raw:
+                raise ConnectionResetError("BIRD control socket closed")
+            line = raw.rstrip(b"\n")
+            if line.startswith(b" "):
+                lines.append(line[1:])
+                continue
+            code, sep, text = line[:4], line[4:5], line[5:]
+            if text:
+                lines.append(text)
+            if sep == b" " or not sep:
+                return code, lines
+
+    def _command(self, cmd: str) -> Optional[tuple[bytes, list[bytes]]]:
+        """Send a command to BIRD over the persistent control socket.
+
+        Reconnects once if the connection was dropped (e.g. BIRD restarted).
+
+        Returns:
+            Tuple of (final reply code, output lines), or None if BIRD is unreachable
+        """
+        with self._sock_lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    self._sock.sendall(f"{cmd}\n".encode())
+                    return self._read_reply()
+                except OSError as e:
+                    self._disconnect()
+                    if attempt:
+                        logger.warning(f"BIRD control socket error: {e}")
+        return None
+
+    def _configure(self) -> bool:
+        """Send 'configure' to BIRD and report whether it was accepted."""
+        reply = self._command("configure")
+        if reply is None:
+            logger.warning("BIRD reload failed: control socket unreachable")
+            return False
+
+        code, lines = reply
+        # 8xxx/9xxx are BIRD runtime/parse errors
+        if code[:1] in (b"8", b"9"):
+            logger.warning(f"BIRD reload failed: {b' '.join(lines).decode(errors='replace')}")
+            return False
+
+        logger.info("BIRD reload successful")
+        return True
 
     def write_peer(self, asn: int, config: str) -> bool:
+        """Write a peer config; an identical file on disk is left untouched."""
         try:
             self.config_dir.mkdir(parents=True, exist_ok=True)
-            (self.config_dir / f"dn42_{asn}.conf").write_text(config)
+            _write_if_changed(self.config_dir / f"dn42_{asn}.conf", config.encode())
             return True
         except Exception as e:
             logger.error(f"Write BIRD config failed: {e}")
             return False
 
+    def write_peers(self, configs: dict[int, str]) -> bool:
+        """Write several peer configs at once (ASN -> config).
+
+        The directory is created once for the whole batch, and files whose
+        content is already identical are left untouched.
+        """
+        try:
+            self.config_dir.mkdir(parents=True, exist_ok=True)
+            for asn, config in configs.items():
+                _write_if_changed(self.config_dir / f"dn42_{asn}.conf", config.encode())
+            return True
+        except Exception as e:
+            logger.error(f"Write BIRD configs failed: {e}")
+            return False
+
     def remove_peer(self, asn: int) -> bool:
         path = self.config_dir / f"dn42_{asn}.conf"
         if path.exists():
@@ -53,7 +187,7 @@ class BirdExecutor:
         try:
             ibgp_dir = self.config_dir.parent / "ibgp.d"
             ibgp_dir.mkdir(parents=True, exist_ok=True)
-            (ibgp_dir / "ibgp_peers.conf").write_text(config)
+            _write_if_changed(ibgp_dir / "ibgp_peers.conf", config.encode())
             return True
         except Exception as e:
             logger.error(f"Write iBGP config failed: {e}")
@@ -63,7 +197,7 @@ class BirdExecutor:
         """Request a BIRD configuration reload with delayed coalescing.
 
         This method schedules a reload to happen after a delay. If called
-        multiple times within the delay window, the timer resets and only
+        multiple times within the delay window, the deadline resets and only
         one reload will execute after all calls have settled.
 
         This prevents BIRD 3.2.0 crash from assertion failure when multiple
@@ -73,41 +207,52 @@ class BirdExecutor:
             bool: True (reload is scheduled), actual result logged asynchronously
         """
         with BirdExecutor._reload_lock:
-            # Cancel any existing timer
-            if BirdExecutor._reload_timer is not None:
-                BirdExecutor._reload_timer.cancel()
+            if BirdExecutor._reload_pending:
                 logger.debug("BIRD reload timer reset (coalescing requests)")
 
+            # Schedule (or push back) the reload
             BirdExecutor._reload_pending = True
+            BirdExecutor._reload_deadline = time.monotonic() + BirdExecutor._coalesce_delay
+            BirdExecutor._reload_executor = self
+            BirdExecutor._reload_event.set()
 
-            # Schedule new reload
-            BirdExecutor._reload_timer = threading.Timer(
-                BirdExecutor._coalesce_delay, self._execute_reload
-            )
-            BirdExecutor._reload_timer.daemon = True
-            BirdExecutor._reload_timer.start()
+            if BirdExecutor._reload_thread is None:
+                BirdExecutor._reload_thread = threading.Thread(
+                    target=BirdExecutor._reload_loop, name="bird-reload", daemon=True
+                )
+                BirdExecutor._reload_thread.start()
 
             logger.debug(f"BIRD reload scheduled in {BirdExecutor._coalesce_delay}s")
 
         return True
 
-    def _execute_reload(self) -> bool:
-        """Actually execute the BIRD reload (called by timer)."""
-        with BirdExecutor._reload_lock:
-            BirdExecutor._reload_pending = False
-            BirdExecutor._reload_timer = None
+    @staticmethod
+    def _reload_loop() -> None:
+        """Reload worker: wait for a pending reload, then for its deadline to pass."""
+        while True:
+            BirdExecutor._reload_event.wait()
+            with BirdExecutor._reload_lock:
+                if not BirdExecutor._reload_pending:
+                    # Cancelled by reload_now()
+                    BirdExecutor._reload_event.clear()
+                    continue
+                remaining = BirdExecutor._reload_deadline - time.monotonic()
+                if remaining <= 0:
+                    BirdExecutor._reload_pending = False
+                    BirdExecutor._reload_event.clear()
+                    executor = BirdExecutor._reload_executor
+            if remaining > 0:
+                time.sleep(remaining)
+                continue
+            try:
+                executor._execute_reload()
+            except Exception as e:
+                logger.error(f"BIRD reload failed: {e}")
 
+    def _execute_reload(self) -> bool:
+        """Actually execute the BIRD reload (called by the reload worker)."""
         logger.info("Executing BIRD configuration reload")
-        result = subprocess.run(
-            ["birdc", "-s", self.bird_ctl, "configure"], capture_output=True, text=True
-        )
-
-        if result.returncode == 0:
-            logger.info("BIRD reload successful")
-            return True
-        else:
-            logger.warning(f"BIRD reload failed: {result.stderr}")
-            return False
+        return self._configure()
 
     def reload_now(self) -> bool:
         """Force immediate BIRD reload, bypassing coalesce delay.
@@ -116,33 +261,20 @@ class BirdExecutor:
         during shutdown or critical error recovery.
         """
         with BirdExecutor._reload_lock:
-            if BirdExecutor._reload_timer is not None:
-                BirdExecutor._reload_timer.cancel()
-                BirdExecutor._reload_timer = None
             BirdExecutor._reload_pending = False
 
         logger.info("Executing immediate BIRD configuration reload")
-        result = subprocess.run(
-            ["birdc", "-s", self.bird_ctl, "configure"], capture_output=True, text=True
-        )
-
-        if result.returncode == 0:
-            logger.info("BIRD reload successful")
-            return True
-        else:
-            logger.warning(f"BIRD reload failed: {result.stderr}")
-            return False
+        return self._configure()
 
     def get_status(self) -> dict:
-        result = subprocess.run(
-            ["birdc", "-s", self.bird_ctl, "show", "protocols"], capture_output=True, text=True
-        )
-        if result.returncode != 0:
+        reply = self._command("show protocols")
+        if reply is None or reply[0][:1] in (b"8", b"9"):
             return {"running": False}
-        up = sum(
-            1 for line in result.stdout.split("\n") if "dn42_" in line and "Established" in line
-        )
-        down = sum(
-            1 for line in result.stdout.split("\n") if "dn42_" in line and "Established" not in line
-        )
+        up = down = 0
+        for line in reply[1]:
+            if b"dn42_" in line:
+                if b"Established" in line:
+                    up += 1
+                else:
+                    down += 1
         return {"running": True, "protocols_up": up, "protocols_down": down}
@@ -4,16 +4,18 @@ MoeNet DN42 Agent - Community Manager
 Handles BGP community parsing, modification, and filtering rules.
 """
 
+import hashlib
 import logging
 import re
 import subprocess
+import time
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
-from .constants import (
-    DN42_ACTIONS,
+from .community_constants import (
     DN42_BANDWIDTH,
+    DN42_COMMUNITY_INDEX,
     DN42_CRYPTO,
     DN42_LATENCY,
     DN42_REGION,
@@ -22,8 +24,28 @@ from .constants import (
 
 logger = logging.getLogger(__name__)
 
+# BIRD prints communities as "(64511, 1)" and large communities as "(4242420998, 1, 100)"
+COMMUNITY_RE = re.compile(r"\((\d+),\s*(\d+)\)")
+LARGE_COMMUNITY_RE = re.compile(r"\((\d+),\s*(\d+),\s*(\d+)\)")
 
-@dataclass
+# How long a full-table community stats result is reused (seconds)
+STATS_CACHE_TTL = 5.0
+
+# Closing lines of every generated community_rule_N() function
+RULE_FOOTER = ("    }", "    return true;", "}", "")
+
+# Route attribute names (BIRD 2 / BIRD 1.x) -> what _parse_route_output extracts
+ROUTE_ATTRIBUTES = {
+    "BGP.as_path": "as_path",
+    "bgp_path": "as_path",
+    "BGP.community": "community",
+    "bgp_community": "community",
+    "BGP.large_community": "large_community",
+    "bgp_large_community": "large_community",
+}
+
+
+@dataclass(slots=True)
 class RouteCommunities:
     """Parsed communities for a route."""
 
@@ -58,7 +80,7 @@ class RouteCommunities:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class FilterRule:
     """Community-based filter rule."""
 
@@ -82,8 +104,12 @@ class CommunityManager:
         # Per-peer community settings cache
         self.peer_communities: Dict[int, dict] = {}  # ASN -> community settings
 
-        # Custom filter rules
-        self.filter_rules: List[FilterRule] = []
+        # Custom filter rules by name (insertion order = order in the filter config)
+        self.filter_rules: Dict[str, FilterRule] = {}
+        # BLAKE2b digest of the filter config on disk, to skip identical rewrites
+        self._last_filter_hash: Optional[bytes] = None
+        # (time.monotonic(), stats) of the last successful full-table scan
+        self._stats_cache: Optional[Tuple[float, dict]] = None
 
     def _birdc(self, cmd: str) -> Optional[str]:
         """Execute BIRD control command."""
@@ -99,13 +125,36 @@ class CommunityManager:
             logger.error(f"birdc failed: {e}")
             return None
 
+    def _birdc_lines(self, cmd: str) -> Iterator[str]:
+        """Stream birdc output line by line instead of buffering the whole reply.
+
+        Raises:
+            OSError / subprocess.SubprocessError if birdc can't run or fails
+        """
+        with subprocess.Popen(
+            ["birdc", "-s", self.bird_ctl, cmd],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1 << 16,
+        ) as proc:
+            try:
+                yield from proc.stdout
+            finally:
+                # Consumer stopped early or raised: don't wait on a full pipe
+                if proc.poll() is None:
+                    proc.kill()
+            proc.wait(timeout=10)
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
+
     def get_route_communities(self, prefix: str) -> Optional[RouteCommunities]:
         """Get communities for a specific route/prefix."""
         result = self._birdc(f"show route for {prefix} all")
         if not result:
             return None
 
-        return self._parse_route_output(result, prefix)
+        return self._parse_route_output(result.splitlines(), prefix)
 
     def get_peer_routes_communities(self, asn: int, limit: int = 10) -> List[RouteCommunities]:
         """Get communities for routes from a specific peer."""
@@ -122,7 +171,7 @@ class CommunityManager:
             # New route starts with a prefix
             if line and not line.startswith(("\t", " ", "BIRD")):
                 if current_prefix and current_lines:
-                    route = self._parse_route_output("\n".join(current_lines), current_prefix)
+                    route = self._parse_route_output(current_lines, current_prefix)
                     if route:
                         routes.append(route)
                         if len(routes) >= limit:
@@ -138,36 +187,36 @@ class CommunityManager:
 
         # Don't forget the last route
         if current_prefix and current_lines and len(routes) < limit:
-            route = self._parse_route_output("\n".join(current_lines), current_prefix)
+            route = self._parse_route_output(current_lines, current_prefix)
             if route:
                 routes.append(route)
 
         return routes
 
-    def _parse_route_output(self, output: str, prefix: str) -> Optional[RouteCommunities]:
-        """Parse BIRD route output to extract communities."""
+    def _parse_route_output(self, lines: Iterable[str], prefix: str) -> Optional[RouteCommunities]:
+        """Parse the BIRD output lines of one route to extract communities."""
         route = RouteCommunities(prefix=prefix)
 
-        for line in output.splitlines():
-            line = line.strip()
+        for line in lines:
+            name, sep, value = line.strip().partition(":")
+            attribute = ROUTE_ATTRIBUTES.get(name) if sep else None
+            if attribute is None:
+                continue
 
             # Parse AS path
-            if "BGP.as_path:" in line or "bgp_path:" in line:
-                as_path_str = line.split(":", 1)[1].strip()
-                route.as_path = [int(asn) for asn in as_path_str.split() if asn.isdigit()]
+            if attribute == "as_path":
+                route.as_path = [int(asn) for asn in value.split() if asn.isdigit()]
 
             # Parse standard communities
-            if "BGP.community:" in line or "bgp_community:" in line:
-                community_str = line.split(":", 1)[1].strip()
-                for match in re.finditer(r"\((\d+),\s*(\d+)\)", community_str):
+            elif attribute == "community":
+                for match in COMMUNITY_RE.finditer(value):
                     com = (int(match.group(1)), int(match.group(2)))
                     route.communities.append(com)
                     self._classify_community(route, com)
 
             # Parse large communities
-            if "BGP.large_community:" in line or "bgp_large_community:" in line:
-                large_com_str = line.split(":", 1)[1].strip()
-                for match in re.finditer(r"\((\d+),\s*(\d+),\s*(\d+)\)", large_com_str):
+            else:
+                for match in LARGE_COMMUNITY_RE.finditer(value):
                     route.large_communities.append(
                         (int(match.group(1)), int(match.group(2)), int(match.group(3)))
                     )
@@ -176,35 +225,17 @@ class CommunityManager:
 
     def _classify_community(self, route: RouteCommunities, com: Tuple[int, int]) -> None:
         """Classify a community and update route attributes."""
-        # Check latency
-        for tier, expected in DN42_LATENCY.items():
-            if com == expected:
-                route.latency_tier = tier
-                return
-
-        # Check bandwidth
-        for name, expected in DN42_BANDWIDTH.items():
-            if com == expected:
-                route.bandwidth = name
-                return
-
-        # Check crypto
-        for name, expected in DN42_CRYPTO.items():
-            if com == expected:
-                route.crypto = name
-                return
-
-        # Check region
-        for name, expected in DN42_REGION.items():
-            if com == expected:
-                route.region = name
-                return
-
-        # Check actions
-        for name, expected in DN42_ACTIONS.items():
-            if com == expected:
-                route.actions.add(name)
-                return
+        kind, name = DN42_COMMUNITY_INDEX.get(com, (None, None))
+        if kind == "latency":
+            route.latency_tier = name
+        elif kind == "bandwidth":
+            route.bandwidth = name
+        elif kind == "crypto":
+            route.crypto = name
+        elif kind == "region":
+            route.region = name
+        elif kind == "actions":
+            route.actions.add(name)
 
     def set_peer_communities(self, asn: int, settings: dict) -> None:
         """Set community settings for a peer.
@@ -226,15 +257,13 @@ class CommunityManager:
         return self.peer_communities.get(asn, {})
 
     def add_filter_rule(self, rule: FilterRule) -> None:
-        """Add a community filter rule."""
-        self.filter_rules.append(rule)
+        """Add a community filter rule (replaces an existing rule with the same name)."""
+        self.filter_rules[rule.name] = rule
         self._regenerate_filter_config()
 
     def remove_filter_rule(self, name: str) -> bool:
         """Remove a filter rule by name."""
-        original_count = len(self.filter_rules)
-        self.filter_rules = [r for r in self.filter_rules if r.name != name]
-        if len(self.filter_rules) < original_count:
+        if self.filter_rules.pop(name, None) is not None:
             self._regenerate_filter_config()
             return True
         return False
@@ -249,7 +278,7 @@ class CommunityManager:
                 "action": r.action,
                 "modify_commands": r.modify_commands,
             }
-            for r in self.filter_rules
+            for r in self.filter_rules.values()
         ]
 
     def _regenerate_filter_config(self) -> None:
@@ -263,10 +292,8 @@ class CommunityManager:
         ]
 
         # Generate filter function for each rule
-        for i, rule in enumerate(self.filter_rules):
-            func_name = f"community_rule_{i}"
-            config_lines.append(f"# Rule: {rule.name}")
-            config_lines.append(f"function {func_name}() {{")
+        for i, rule in enumerate(self.filter_rules.values()):
+            config_lines.extend((f"# Rule: {rule.name}", f"function community_rule_{i}() {{"))
 
             if rule.match_type == "community":
                 config_lines.append(f"    if ({rule.match_value} ~ bgp_community) then {{")
@@ -280,18 +307,28 @@ class CommunityManager:
             elif rule.action == "accept":
                 config_lines.append("        return true;")
             elif rule.action == "modify":
-                for cmd in rule.modify_commands:
-                    config_lines.append(f"        {cmd};")
+                config_lines.extend(f"        {cmd};" for cmd in rule.modify_commands)
                 config_lines.append("        return true;")
 
-            config_lines.append("    }")
-            config_lines.append("    return true;")
-            config_lines.append("}")
-            config_lines.append("")
+            config_lines.extend(RULE_FOOTER)
 
-        # Write to file
+        # Write to file, unless it already holds exactly this config; the
+        # first regeneration after start hashes the existing file instead
+        data = "\n".join(config_lines).encode()
+        digest = hashlib.blake2b(data, digest_size=16).digest()
         filter_path = self.filter_dir / "community_rules.conf"
-        filter_path.write_text("\n".join(config_lines))
+        if self._last_filter_hash is None:
+            try:
+                self._last_filter_hash = hashlib.blake2b(
+                    filter_path.read_bytes(), digest_size=16
+                ).digest()
+            except FileNotFoundError:
+                pass
+        if digest == self._last_filter_hash and filter_path.exists():
+            logger.debug("Community filters unchanged")
+            return
+        filter_path.write_bytes(data)
+        self._last_filter_hash = digest
         logger.info(f"Regenerated community filters at {filter_path}")
 
     def generate_peer_filter(self, asn: int) -> str:
@@ -326,11 +363,13 @@ class CommunityManager:
         return "\n".join(lines)
 
     def get_community_stats(self) -> dict:
-        """Get statistics about community usage across all routes."""
-        # Get all routes
-        result = self._birdc("show route all")
-        if not result:
-            return {"error": "Failed to get routes"}
+        """Get statistics about community usage across all routes.
+
+        A result is reused for STATS_CACHE_TTL seconds, so repeated polling
+        doesn't make BIRD walk and dump the whole table each time.
+        """
+        if self._stats_cache and time.monotonic() - self._stats_cache[0] < STATS_CACHE_TTL:
+            return self._stats_cache[1]
 
         stats = {
             "total_routes": 0,
@@ -340,31 +379,37 @@ class CommunityManager:
             "region_distribution": {k: 0 for k in DN42_REGION.keys()},
         }
 
-        current_lines = []
-        for line in result.splitlines():
-            if line and not line.startswith(("\t", " ", "BIRD")):
-                if current_lines:
-                    route = self._parse_route_output("\n".join(current_lines), "")
-                    if route:
-                        stats["total_routes"] += 1
-                        if route.latency_tier is not None:
-                            stats["latency_distribution"][route.latency_tier] += 1
-                        if route.bandwidth:
-                            stats["bandwidth_distribution"][route.bandwidth] += 1
-                        if route.crypto:
-                            stats["crypto_distribution"][route.crypto] += 1
-                        if route.region:
-                            stats["region_distribution"][route.region] += 1
-                current_lines = [line]
-            else:
-                current_lines.append(line)
-
-        # Process last route
-        if current_lines:
-            route = self._parse_route_output("\n".join(current_lines), "")
+        def count(lines: List[str]) -> None:
+            route = self._parse_route_output(lines, "")
             if route:
                 stats["total_routes"] += 1
                 if route.latency_tier is not None:
                     stats["latency_distribution"][route.latency_tier] += 1
+                if route.bandwidth:
+                    stats["bandwidth_distribution"][route.bandwidth] += 1
+                if route.crypto:
+                    stats["crypto_distribution"][route.crypto] += 1
+                if route.region:
+                    stats["region_distribution"][route.region] += 1
+
+        # Stream all routes; the full table can be tens of MB of text
+        current_lines = []
+        try:
+            for line in self._birdc_lines("show route all"):
+                line = line.rstrip("\n")
+                if line and not line.startswith(("\t", " ", "BIRD")):
+                    if current_lines:
+                        count(current_lines)
+                    current_lines = [line]
+                else:
+                    current_lines.append(line)
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.error(f"birdc failed: {e}")
+            return {"error": "Failed to get routes"}
+
+        # Process last route
+        if current_lines:
+            count(current_lines)
 
+        self._stats_cache = (time.monotonic(), stats)
         return stats
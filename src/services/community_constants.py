@@ -4,6 +4,7 @@ DN42 BGP Community Constants
 Reference: https://dn42.eu/howto/Bird-communities
 """
 
+from bisect import bisect_right
 from typing import Optional, Tuple
 
 # DN42 Community Prefix
@@ -117,13 +118,24 @@ ALL_COMMUNITIES = {
     "moenet_link": MOENET_LINK,
 }
 
+# Reverse index for classifying standard communities: (asn, value) -> (kind, key)
+DN42_COMMUNITY_INDEX = {
+    com: (kind, key)
+    for kind, table in (
+        ("latency", DN42_LATENCY),
+        ("bandwidth", DN42_BANDWIDTH),
+        ("crypto", DN42_CRYPTO),
+        ("region", DN42_REGION),
+        ("actions", DN42_ACTIONS),
+    )
+    for key, com in table.items()
+}
+
 
 def latency_to_tier(rtt_ms: float) -> int:
     """Convert RTT in milliseconds to latency tier (0-8)."""
-    for tier, threshold in enumerate(LATENCY_THRESHOLDS):
-        if rtt_ms < threshold:
-            return tier
-    return 8  # Highest tier (slowest)
+    # First tier whose upper bound is > rtt_ms; past the last threshold -> 8 (slowest)
+    return bisect_right(LATENCY_THRESHOLDS, rtt_ms)
 
 
 def tier_to_latency_range(tier: int) -> Tuple[float, float]:
@@ -139,105 +151,104 @@ def tier_to_latency_range(tier: int) -> Tuple[float, float]:
         return (LATENCY_THRESHOLDS[tier - 1], LATENCY_THRESHOLDS[tier])
 
 
+# Region/city/country names -> DN42 region code (keys are lowercase)
+REGION_NAME_TO_CODE = {
+    # Asia - East
+    "hk": "as-e",
+    "hongkong": "as-e",
+    "hong kong": "as-e",
+    "jp": "as-e",
+    "japan": "as-e",
+    "tokyo": "as-e",
+    "osaka": "as-e",
+    "kr": "as-e",
+    "korea": "as-e",
+    "seoul": "as-e",
+    "cn": "as-e",
+    "china": "as-e",
+    "shanghai": "as-e",
+    "beijing": "as-e",
+    "tw": "as-e",
+    "taiwan": "as-e",
+    "taipei": "as-e",
+    # Asia - Southeast
+    "sg": "as-se",
+    "singapore": "as-se",
+    "my": "as-se",
+    "malaysia": "as-se",
+    "kuala lumpur": "as-se",
+    "th": "as-se",
+    "thailand": "as-se",
+    "bangkok": "as-se",
+    "vn": "as-se",
+    "vietnam": "as-se",
+    "hanoi": "as-se",
+    "ho chi minh": "as-se",
+    "id": "as-se",
+    "indonesia": "as-se",
+    "jakarta": "as-se",
+    "ph": "as-se",
+    "philippines": "as-se",
+    "manila": "as-se",
+    # Asia - South
+    "in": "as-s",
+    "india": "as-s",
+    "mumbai": "as-s",
+    "delhi": "as-s",
+    "bd": "as-s",
+    "bangladesh": "as-s",
+    "dhaka": "as-s",
+    "pk": "as-s",
+    "pakistan": "as-s",
+    "karachi": "as-s",
+    # Europe
+    "de": "eu",
+    "germany": "eu",
+    "frankfurt": "eu",
+    "berlin": "eu",
+    "nl": "eu",
+    "netherlands": "eu",
+    "amsterdam": "eu",
+    "gb": "eu",
+    "uk": "eu",
+    "london": "eu",
+    "fr": "eu",
+    "france": "eu",
+    "paris": "eu",
+    # North America - East
+    "us-e": "na-e",
+    "new york": "na-e",
+    "nyc": "na-e",
+    "miami": "na-e",
+    "washington": "na-e",
+    "dc": "na-e",
+    "boston": "na-e",
+    # North America - Central
+    "us-c": "na-c",
+    "chicago": "na-c",
+    "dallas": "na-c",
+    "denver": "na-c",
+    # North America - West
+    "us-w": "na-w",
+    "los angeles": "na-w",
+    "la": "na-w",
+    "san francisco": "na-w",
+    "sf": "na-w",
+    "seattle": "na-w",
+    # Oceania
+    "au": "oc",
+    "australia": "oc",
+    "sydney": "oc",
+    "melbourne": "oc",
+    "nz": "oc",
+    "new zealand": "oc",
+    "auckland": "oc",
+}
+
+
 def region_name_to_code(name: str) -> Optional[str]:
     """Convert region name to code (e.g., 'Hong Kong' -> 'as-e')."""
-    name_lower = name.lower().strip()
-
-    # Direct mappings
-    mappings = {
-        # Asia - East
-        "hk": "as-e",
-        "hongkong": "as-e",
-        "hong kong": "as-e",
-        "jp": "as-e",
-        "japan": "as-e",
-        "tokyo": "as-e",
-        "osaka": "as-e",
-        "kr": "as-e",
-        "korea": "as-e",
-        "seoul": "as-e",
-        "cn": "as-e",
-        "china": "as-e",
-        "shanghai": "as-e",
-        "beijing": "as-e",
-        "tw": "as-e",
-        "taiwan": "as-e",
-        "taipei": "as-e",
-        # Asia - Southeast
-        "sg": "as-se",
-        "singapore": "as-se",
-        "my": "as-se",
-        "malaysia": "as-se",
-        "kuala lumpur": "as-se",
-        "th": "as-se",
-        "thailand": "as-se",
-        "bangkok": "as-se",
-        "vn": "as-se",
-        "vietnam": "as-se",
-        "hanoi": "as-se",
-        "ho chi minh": "as-se",
-        "id": "as-se",
-        "indonesia": "as-se",
-        "jakarta": "as-se",
-        "ph": "as-se",
-        "philippines": "as-se",
-        "manila": "as-se",
-        # Asia - South
-        "in": "as-s",
-        "india": "as-s",
-        "mumbai": "as-s",
-        "delhi": "as-s",
-        "bd": "as-s",
-        "bangladesh": "as-s",
-        "dhaka": "as-s",
-        "pk": "as-s",
-        "pakistan": "as-s",
-        "karachi": "as-s",
-        # Europe
-        "de": "eu",
-        "germany": "eu",
-        "frankfurt": "eu",
-        "berlin": "eu",
-        "nl": "eu",
-        "netherlands": "eu",
-        "amsterdam": "eu",
-        "gb": "eu",
-        "uk": "eu",
-        "london": "eu",
-        "fr": "eu",
-        "france": "eu",
-        "paris": "eu",
-        # North America - East
-        "us-e": "na-e",
-        "new york": "na-e",
-        "nyc": "na-e",
-        "miami": "na-e",
-        "washington": "na-e",
-        "dc": "na-e",
-        "boston": "na-e",
-        # North America - Central
-        "us-c": "na-c",
-        "chicago": "na-c",
-        "dallas": "na-c",
-        "denver": "na-c",
-        # North America - West
-        "us-w": "na-w",
-        "los angeles": "na-w",
-        "la": "na-w",
-        "san francisco": "na-w",
-        "sf": "na-w",
-        "seattle": "na-w",
-        # Oceania
-        "au": "oc",
-        "australia": "oc",
-        "sydney": "oc",
-        "melbourne": "oc",
-        "nz": "oc",
-        "new zealand": "oc",
-        "auckland": "oc",
-    }
-
-    return mappings.get(name_lower, None)
+    return REGION_NAME_TO_CODE.get(name.lower().strip())
 
 
 def parse_community(community_str: str) -> Tuple[int, int]:
@@ -254,39 +265,32 @@ def community_to_str(community: Tuple[int, int]) -> str:
     return f"({community[0]}, {community[1]})"
 
 
+def _format_description(kind: str, name) -> str:
+    """Format the description of a known DN42 community (kind/key from the index)."""
+    if kind == "latency":
+        min_rtt, max_rtt = tier_to_latency_range(name)
+        if name == 8:
+            return f"Latency ≥{min_rtt}ms"
+        return f"Latency <{max_rtt}ms"
+    if kind == "bandwidth":
+        return f"Bandwidth ≥{name.upper()}"
+    if kind == "crypto":
+        return f"Crypto: {name.title()}"
+    if kind == "region":
+        return f"Region: {name.upper()}"
+    return f"Action: {name.replace('_', ' ').title()}"
+
+
+# Precomputed descriptions: (asn, value) -> text
+DN42_COMMUNITY_DESCRIPTIONS = {
+    com: _format_description(kind, name) for com, (kind, name) in DN42_COMMUNITY_INDEX.items()
+}
+
+
 def describe_community(community: Tuple[int, int]) -> str:
     """Get human-readable description of a community."""
-    asn, value = community
-
-    if asn != DN42_COMMUNITY_ASN:
+    description = DN42_COMMUNITY_DESCRIPTIONS.get(community)
+    if description is None:
+        asn, value = community
         return f"Unknown ({asn}, {value})"
-
-    # Check latency
-    for tier, com in DN42_LATENCY.items():
-        if com[1] == value:
-            min_rtt, max_rtt = tier_to_latency_range(tier)
-            if tier == 8:
-                return f"Latency ≥{min_rtt}ms"
-            return f"Latency <{max_rtt}ms"
-
-    # Check bandwidth
-    for name, com in DN42_BANDWIDTH.items():
-        if com[1] == value:
-            return f"Bandwidth ≥{name.upper()}"
-
-    # Check crypto
-    for name, com in DN42_CRYPTO.items():
-        if com[1] == value:
-            return f"Crypto: {name.title()}"
-
-    # Check region
-    for name, com in DN42_REGION.items():
-        if com[1] == value:
-            return f"Region: {name.upper()}"
-
-    # Check actions
-    for name, com in DN42_ACTIONS.items():
-        if com[1] == value:
-            return f"Action: {name.replace('_', ' ').title()}"
-
-    return f"Unknown ({asn}, {value})"
+    return description
@@ -12,6 +12,9 @@ Port allocation scheme:
 - Example: Node 3 connecting to Node 1 -> listen on 51821, connect to 51823
 """
 
+import asyncio
+import hashlib
+import json
 import logging
 import subprocess
 from pathlib import Path
@@ -53,6 +56,8 @@ class MeshSync:
         self._private_key: Optional[str] = None
         self._public_key: Optional[str] = None
         self._active_interfaces: Set[str] = set()
+        # Digest of the last mesh config applied successfully
+        self._applied_hash: Optional[str] = None
 
     async def init_keys(self) -> tuple[str, str]:
         """Initialize mesh WireGuard keys.
@@ -91,8 +96,6 @@ class MeshSync:
 
         def add_addr(addr: str, dev: str = "dummy0") -> bool:
             """Add address to interface if not already present."""
-            import ipaddress
-
             if not addr:
                 return True
 
@@ -102,30 +105,17 @@ class MeshSync:
                 addr = f"{addr}{suffix}"
 
             try:
-                # Normalize the input address for comparison
-                addr_only = addr.split("/")[0]
-                if ":" in addr_only:
-                    normalized_input = str(ipaddress.ip_address(addr_only))
-                else:
-                    normalized_input = addr_only
-
-                # Check if already configured
+                # Add address; "File exists" means it is already configured
                 family = "-4" if "." in addr else "-6"
-                result = subprocess.run(
-                    ["ip", family, "addr", "show", "dev", dev], capture_output=True, text=True
-                )
-
-                if normalized_input in result.stdout:
-                    logger.debug(f"Address {addr} already configured on {dev}")
-                    return True
-
-                # Add address
                 result = subprocess.run(
                     ["ip", family, "addr", "add", addr, "dev", dev], capture_output=True, text=True
                 )
-                if result.returncode == 0 or "exists" in result.stderr:
+                if result.returncode == 0:
                     logger.info(f"Configured {addr} on {dev}")
                     return True
+                elif "exists" in result.stderr:
+                    logger.debug(f"Address {addr} already configured on {dev}")
+                    return True
                 else:
                     logger.error(f"Failed to add {addr}: {result.stderr}")
                     return False
@@ -147,24 +137,20 @@ class MeshSync:
         """
         link_local = generate_link_local(self.node_id)
         try:
-            # Check if already configured
+            # Add link-local address; "File exists" means it is already configured
             result = subprocess.run(
-                ["ip", "-6", "addr", "show", "dev", interface_name], capture_output=True, text=True
-            )
-            if link_local in result.stdout:
-                logger.debug(f"Link-local {link_local} already configured on {interface_name}")
-                return
-
-            # Add link-local address
-            subprocess.run(
                 ["ip", "-6", "addr", "add", f"{link_local}/64", "dev", interface_name],
                 capture_output=True,
-                check=True,
+                text=True,
             )
-            logger.info(f"Configured link-local {link_local}/64 on {interface_name}")
-        except subprocess.CalledProcessError as e:
-            if "exists" not in str(e.stderr):
-                logger.warning(f"Failed to add link-local on {interface_name}: {e}")
+            if result.returncode == 0:
+                logger.info(f"Configured link-local {link_local}/64 on {interface_name}")
+            elif "exists" in result.stderr:
+                logger.debug(f"Link-local {link_local} already configured on {interface_name}")
+            else:
+                logger.warning(
+                    f"Failed to add link-local on {interface_name}: {result.stderr.strip()}"
+                )
         except Exception as e:
             logger.warning(f"Error configuring link-local on {interface_name}: {e}")
 
@@ -207,7 +193,7 @@ class MeshSync:
                 except (ValueError, IndexError):
                     pass
 
-    async def sync_mesh(self) -> bool:
+    async def sync_mesh(self, force: bool = False) -> bool:
         """Sync mesh network configuration (P2P Mode).
 
         1. Get mesh config from control plane
@@ -215,9 +201,14 @@ class MeshSync:
         3. Create/update WG IGP interface for each peer
         4. Configure link-local and MTU per interface
         5. Update Babel config
-        """
-        logger.info("Syncing mesh network (P2P mode)...")
 
+        Steps 2-5 are skipped if the mesh config is identical to the last one
+        applied successfully, unless force is set.
+
+        Returns:
+            True if the mesh config is applied (loopback configured and every
+            tunnel up); False leaves it to be applied again next call
+        """
         # Ensure keys are initialized
         private_key, public_key = await self.init_keys()
 
@@ -227,22 +218,45 @@ class MeshSync:
             logger.warning("No mesh config available")
             return False
 
+        mesh_hash = hashlib.blake2b(
+            json.dumps(mesh_config, sort_keys=True).encode(), digest_size=16
+        ).hexdigest()
+        if not force and mesh_hash == self._applied_hash:
+            logger.debug("Mesh config unchanged")
+            return True
+
+        logger.info("Syncing mesh network (P2P mode)...")
+        if not await self._apply_mesh(mesh_config, private_key):
+            logger.warning("Mesh sync incomplete, will retry")
+            return False
+        self._applied_hash = mesh_hash
+        return True
+
+    async def _apply_mesh(self, mesh_config: dict, private_key: str) -> bool:
+        """Apply a mesh config: loopback, per-peer interfaces and Babel.
+
+        Returns:
+            True if the loopback was configured and every interface came up
+        """
+        ok = True
+
         # Configure loopback addresses on dummy0
         local_loopback = mesh_config.get("loopback")
         dn42_ipv4 = mesh_config.get("dn42_ipv4")
         dn42_ipv6 = mesh_config.get("dn42_ipv6")
         if local_loopback or dn42_ipv4 or dn42_ipv6:
-            self.configure_loopback(local_loopback, dn42_ipv4, dn42_ipv6)
+            ok &= self.configure_loopback(local_loopback, dn42_ipv4, dn42_ipv6)
 
         peers = mesh_config.get("peers", [])
         logger.info(f"Mesh peers: {len(peers)}")
 
         if not peers:
             logger.info("No mesh peers configured")
-            return True
+            return ok
 
         # Track active peer IDs for cleanup
         active_peer_ids: Set[int] = set()
+        interfaces: list[tuple[str, str, int]] = []  # (interface, peer name, listen port)
 
         # Configure each peer in P2P mode
         for peer in peers:
@@ -268,10 +282,15 @@ class MeshSync:
                 base_port=MESH_BASE_PORT,
             )
 
-            # Write and bring up interface
-            self.wg.write_interface(interface_name, config)
-            self.wg.up(interface_name)
+            # Write interface config (brought up below, all peers at once)
+            ok &= self.wg.write_interface(interface_name, config)
+            interfaces.append((interface_name, peer_name, listen_port))
+
+        # Bring up all interfaces concurrently (one subprocess chain per peer)
+        results = await asyncio.gather(*(self.wg.up_async(name) for name, _, _ in interfaces))
+        ok &= all(results)
 
+        for interface_name, peer_name, listen_port in interfaces:
             # Configure MTU (can be customized per peer in future)
             self._set_interface_mtu(interface_name, MESH_MTU_DEFAULT)
 
@@ -307,5 +326,4 @@ class MeshSync:
             self.bird.reload()
 
         logger.info("Mesh sync complete (P2P mode)")
-
-        return True
+        return ok
@@ -1,14 +1,50 @@
-"""MoeNet DN42 Agent - Firewall Executor
+"""MoeNet DN42 Agent - Network Executors
 
-Manages iptables rules for WireGuard peer ports.
+FirewallExecutor manages iptables rules for WireGuard peer ports.
+LoopbackExecutor configures the dummy0 interface with DN42 IP addresses based on node_id.
 """
 
+import errno
+import ipaddress
+import json
 import logging
 import subprocess
-from typing import List
+from pathlib import Path
+from typing import List, Optional, Set, Tuple
+
+try:
+    from pyroute2 import IPRoute
+    from pyroute2.netlink.exceptions import NetlinkError
+except ImportError:  # optional dependency, addresses are managed with the ip binary
+    IPRoute = None
+    NetlinkError = None
 
 logger = logging.getLogger(__name__)
 
+# Kernel view of network interfaces (one directory per interface)
+SYS_CLASS_NET = Path("/sys/class/net")
+IFF_UP = 0x1
+# iptables front-ends for the IPv4 and IPv6 rule sets
+IPTABLES_FAMILIES = ("iptables", "ip6tables")
+
+
+def interface_exists(name: str) -> bool:
+    """Check if a network interface exists without forking ip(8)."""
+    return (SYS_CLASS_NET / name).exists()
+
+
+def interface_is_up(name: str) -> bool:
+    """Check if a network interface is administratively up.
+
+    Reads the IFF_UP bit from /sys/class/net/<name>/flags. operstate is not
+    used because dummy and WireGuard interfaces report "unknown" there.
+    """
+    try:
+        flags = int((SYS_CLASS_NET / name / "flags").read_text(), 16)
+    except (OSError, ValueError):
+        return False
+    return bool(flags & IFF_UP)
+
 
 class FirewallExecutor:
     """Manages iptables rules for DN42 WireGuard ports."""
@@ -31,54 +67,10 @@ class FirewallExecutor:
             logger.debug(f"Port {port}/{protocol} already open")
             return True
 
-        comment = f"{self._comment_prefix}-{port}"
-
-        # IPv4
-        result4 = subprocess.run(
-            [
-                "iptables",
-                "-A",
-                self.chain,
-                "-p",
-                protocol,
-                "--dport",
-                str(port),
-                "-m",
-                "comment",
-                "--comment",
-                comment,
-                "-j",
-                "ACCEPT",
-            ],
-            capture_output=True,
-        )
-
-        # IPv6
-        result6 = subprocess.run(
-            [
-                "ip6tables",
-                "-A",
-                self.chain,
-                "-p",
-                protocol,
-                "--dport",
-                str(port),
-                "-m",
-                "comment",
-                "--comment",
-                comment,
-                "-j",
-                "ACCEPT",
-            ],
-            capture_output=True,
-        )
-
-        success = result4.returncode == 0 and result6.returncode == 0
+        success = self._append_rules([port], protocol)
         if success:
             logger.info(f"Opened port {port}/{protocol}")
             self._save_rules()
-        else:
-            logger.error(f"Failed to open port {port}: {result4.stderr} {result6.stderr}")
 
         return success
 
@@ -92,32 +84,21 @@ class FirewallExecutor:
         Returns:
             True if successful, False otherwise
         """
-        comment = f"{self._comment_prefix}-{port}"
+        self._delete_port(port, protocol)
+        logger.info(f"Removed port {port}/{protocol}")
+        self._save_rules()
+        return True
 
-        # Remove IPv4 rule
-        subprocess.run(
-            [
-                "iptables",
-                "-D",
-                self.chain,
-                "-p",
-                protocol,
-                "--dport",
-                str(port),
-                "-m",
-                "comment",
-                "--comment",
-                comment,
-                "-j",
-                "ACCEPT",
-            ],
-            capture_output=True,
-        )
+    def _delete_port(self, port: int, protocol: str = "udp") -> None:
+        """Delete the IPv4 and IPv6 rules for a port (missing rules are ignored)."""
+        for tool in IPTABLES_FAMILIES:
+            self._delete_family_rule(tool, port, protocol)
 
-        # Remove IPv6 rule
+    def _delete_family_rule(self, tool: str, port: int, protocol: str = "udp") -> None:
+        """Delete one port's rule with iptables or ip6tables (a missing rule is ignored)."""
         subprocess.run(
             [
-                "ip6tables",
+                tool,
                 "-D",
                 self.chain,
                 "-p",
@@ -127,25 +108,24 @@ class FirewallExecutor:
                 "-m",
                 "comment",
                 "--comment",
-                comment,
+                f"{self._comment_prefix}-{port}",
                 "-j",
                 "ACCEPT",
             ],
             capture_output=True,
         )
 
-        logger.info(f"Removed port {port}/{protocol}")
-        self._save_rules()
-        return True
-
-    def get_open_ports(self) -> List[int]:
+    def get_open_ports(self, tool: str = "iptables") -> List[int]:
         """Get list of ports opened by this agent.
 
+        Args:
+            tool: "iptables" (IPv4 rules) or "ip6tables" (IPv6 rules)
+
         Returns:
             List of port numbers
         """
         result = subprocess.run(
-            ["iptables", "-L", self.chain, "-n", "--line-numbers"], capture_output=True, text=True
+            [tool, "-L", self.chain, "-n", "--line-numbers"], capture_output=True, text=True
         )
 
         ports = []
@@ -170,19 +150,82 @@ class FirewallExecutor:
         Returns:
             dict with added and removed counts
         """
-        current = set(self.get_open_ports())
         expected = set(expected_ports)
+        added, removed = set(), set()
 
-        to_add = expected - current
-        to_remove = current - expected
+        # Each family is diffed against its own listing, so a failed or
+        # drifted IPv6 batch is repaired on the next sync
+        for tool in IPTABLES_FAMILIES:
+            current = set(self.get_open_ports(tool))
+            to_add = sorted(expected - current)
+            to_remove = sorted(current - expected)
 
-        for port in to_add:
-            self.allow_port(port)
+            # The listing already says which ports are missing, so add them
+            # all in one restore transaction instead of checking each
+            if to_add and self._append_rules(to_add, tools=(tool,)):
+                logger.info(f"Opened ports {to_add} ({tool})")
+
+            if to_remove:
+                self._delete_rules(to_remove, tools=(tool,))
+                logger.info(f"Removed ports {to_remove} ({tool})")
+
+            added.update(to_add)
+            removed.update(to_remove)
+
+        # Persist once for the whole sync
+        if added or removed:
+            self._save_rules()
 
-        for port in to_remove:
-            self.remove_port(port)
+        return {"added": len(added), "removed": len(removed)}
 
-        return {"added": len(to_add), "removed": len(to_remove)}
+    def _append_rules(
+        self, ports: List[int], protocol: str = "udp", tools: Tuple[str, ...] = IPTABLES_FAMILIES
+    ) -> bool:
+        """Append ACCEPT rules for ports via one `iptables-restore --noflush` per family.
+
+        Returns:
+            True if the transactions for all given families were applied
+        """
+        rules = "".join(
+            f"-A {self.chain} -p {protocol} --dport {port} -m comment "
+            f"--comment {self._comment_prefix}-{port} -j ACCEPT\n"
+            for port in ports
+        )
+        payload = f"*filter\n{rules}COMMIT\n"
+
+        success = True
+        for tool in tools:
+            result = subprocess.run(
+                [f"{tool}-restore", "--noflush"], input=payload, capture_output=True, text=True
+            )
+            if result.returncode != 0:
+                logger.error(f"{tool}-restore failed for ports {ports}: {result.stderr.strip()}")
+                success = False
+        return success
+
+    def _delete_rules(
+        self, ports: List[int], protocol: str = "udp", tools: Tuple[str, ...] = IPTABLES_FAMILIES
+    ) -> None:
+        """Delete ACCEPT rules for ports via one `iptables-restore --noflush` per family.
+
+        A restore transaction is all-or-nothing and a missing rule aborts it,
+        so a family whose transaction fails falls back to per-port deletes.
+        """
+        rules = "".join(
+            f"-D {self.chain} -p {protocol} --dport {port} -m comment "
+            f"--comment {self._comment_prefix}-{port} -j ACCEPT\n"
+            for port in ports
+        )
+        payload = f"*filter\n{rules}COMMIT\n"
+
+        for tool in tools:
+            result = subprocess.run(
+                [f"{tool}-restore", "--noflush"], input=payload, capture_output=True, text=True
+            )
+            if result.returncode != 0:
+                logger.debug(f"{tool}-restore delete failed, deleting per port: {result.stderr}")
+                for port in ports:
+                    self._delete_family_rule(tool, port, protocol)
 
     def _port_exists(self, port: int, protocol: str = "udp") -> bool:
         """Check if port rule already exists."""
@@ -199,12 +242,6 @@ class FirewallExecutor:
         subprocess.run("ip6tables-save > /etc/iptables/rules.v6 2>/dev/null || true", shell=True)
 
 
-"""MoeNet DN42 Agent - Loopback IP Executor
-
-Configures the dummy0 interface with DN42 IP addresses based on node_id.
-"""
-
-
 class LoopbackExecutor:
     """Configure dummy0 interface with DN42 IPs."""
 
@@ -217,6 +254,10 @@ class LoopbackExecutor:
         self.interface = interface
         self.dn42_ipv4_prefix = dn42_ipv4_prefix
         self.dn42_ipv6_prefix = dn42_ipv6_prefix
+        # Parsed once; membership tests on these are integer mask compares
+        self._ipv4_net = ipaddress.ip_network(dn42_ipv4_prefix, strict=False)
+        self._ipv6_net = ipaddress.ip_network(dn42_ipv6_prefix, strict=False)
+        self._max_host_id = self._ipv4_net.num_addresses - 2  # minus network and broadcast
 
     def setup_loopback(self, node_id: int) -> bool:
         """Configure dummy0 with DN42 IPs based on node_id.
@@ -231,26 +272,24 @@ class LoopbackExecutor:
             node_id: Must be 1-62 for /26 subnet (64 addresses minus network/broadcast)
         """
         # Validate node_id is within /26 range
-        prefix_len = int(self.dn42_ipv4_prefix.split("/")[1])
-        max_host_id = (2 ** (32 - prefix_len)) - 2  # Subtract network and broadcast
+        max_host_id = self._max_host_id
 
         if node_id < 1 or node_id > max_host_id:
             logger.error(
-                f"Invalid node_id={node_id}: must be 1-{max_host_id} for /{prefix_len} subnet. "
+                f"Invalid node_id={node_id}: must be 1-{max_host_id} "
+                f"for /{self._ipv4_net.prefixlen} subnet. "
                 f"Re-register with Control Plane to get a valid node_id."
             )
             return False
 
         try:
             # Calculate node-specific addresses
-            # IPv4: base prefix + node_id
-            ipv4_base = self.dn42_ipv4_prefix.split("/")[0]
-            ipv4_parts = ipv4_base.split(".")
-            ipv4_node = f"{'.'.join(ipv4_parts[:-1])}.{node_id}"
+            # IPv4: network address + node_id (e.g., 172.22.188.0/26 -> 172.22.188.4)
+            ipv4_node = str(self._ipv4_net.network_address + node_id)
 
-            # IPv6: base prefix + ::node_id
-            ipv6_base = self.dn42_ipv6_prefix.split("/")[0].rstrip(":")
-            ipv6_node = f"{ipv6_base}::{node_id}"
+            # IPv6: node_id's decimal digits as the last hextet, as deployed
+            # nodes already use (e.g., fd00:4242:7777::/48 -> fd00:4242:7777::12 for node 12)
+            ipv6_node = str(self._ipv6_net.network_address + int(str(node_id), 16))
 
             # Note: Only add specific /32 and /128 addresses to the interface
             # The prefixes are announced via BGP from the direct protocol
@@ -263,11 +302,26 @@ class LoopbackExecutor:
                 (f"{ipv6_node}/128", "IPv6 node"),
             ]
 
+            # One snapshot of the interface addresses serves cleanup and adds
+            existing = self._interface_addresses()
+            changes = []
+
             # Cleanup any stale node-specific addresses (from old node_id)
-            self._cleanup_stale_addresses(ipv4_node, ipv6_node)
+            if existing is not None:
+                for addr in self._stale_addresses(ipv4_node, ipv6_node, existing):
+                    logger.info(f"Removing stale address: {addr}")
+                    changes.append(("del", addr))
 
             for addr, desc in addresses:
-                self._add_address(addr, desc)
+                ip, _, plen = addr.partition("/")
+                if existing is not None and (ip, int(plen)) in existing:
+                    logger.debug(f"{desc} {addr} already exists")
+                    continue
+                logger.info(f"Adding {desc}: {addr}")
+                changes.append(("add", addr))
+
+            if changes:
+                self._apply_changes(changes)
 
             logger.info(f"Loopback configured: IPv4={ipv4_node}, IPv6={ipv6_node}")
             return True
@@ -276,132 +330,140 @@ class LoopbackExecutor:
             logger.error(f"Failed to configure loopback: {e}")
             return False
 
-    def _cleanup_stale_addresses(self, current_ipv4: str, current_ipv6: str) -> None:
-        """Remove stale node-specific addresses from old node_id.
-
-        Keeps:
-        - The IPv4/IPv6 prefix addresses (for BGP announcement)
-        - The current node-specific addresses
+    def _interface_addresses(self) -> Optional[Set[Tuple[str, int]]]:
+        """Get the (address, prefix_len) pairs configured on the interface.
 
-        Removes:
-        - Any other /32 or /128 addresses in the DN42 range
+        Returns:
+            Set of addresses from netlink or `ip -j addr show`, or None if it failed
         """
         try:
-            # Get current addresses on interface
+            if IPRoute is not None:
+                with IPRoute() as ipr:
+                    index = ipr.link_lookup(ifname=self.interface)
+                    if not index:
+                        return None
+                    return {
+                        (msg.get_attr("IFA_LOCAL") or msg.get_attr("IFA_ADDRESS"), msg["prefixlen"])
+                        for msg in ipr.get_addr(index=index[0])
+                    }
+
             result = subprocess.run(
-                ["ip", "addr", "show", self.interface],
+                ["ip", "-j", "addr", "show", "dev", self.interface],
                 capture_output=True,
                 text=True,
             )
-
             if result.returncode != 0:
-                return
-
-            # Parse IPv4 prefix info
-            ipv4_base = self.dn42_ipv4_prefix.split("/")[0]
-            ipv4_prefix_parts = ipv4_base.rsplit(".", 1)[0]  # e.g., "172.22.188"
-
-            # Parse IPv6 prefix info
-            ipv6_base = self.dn42_ipv6_prefix.split("/")[0].rstrip(":")
-
-            # Find and remove stale addresses
-            import re
-
-            for line in result.stdout.split("\n"):
-                # Match IPv4 addresses
-                ipv4_match = re.search(r"inet (\d+\.\d+\.\d+\.\d+)/(\d+)", line)
-                if ipv4_match:
-                    addr = ipv4_match.group(1)
-                    prefix_len = ipv4_match.group(2)
-                    # Check if it's a /32 node address in our range but NOT current
-                    if (
-                        prefix_len == "32"
-                        and addr.rsplit(".", 1)[0] == ipv4_prefix_parts
-                        and addr != current_ipv4
-                    ):
-                        logger.info(f"Removing stale IPv4: {addr}/32")
-                        subprocess.run(
-                            ["ip", "addr", "del", f"{addr}/32", "dev", self.interface],
-                            capture_output=True,
-                        )
-
-                # Match IPv6 addresses
-                ipv6_match = re.search(r"inet6 ([a-f0-9:]+)/(\d+)", line)
-                if ipv6_match:
-                    addr = ipv6_match.group(1)
-                    prefix_len = ipv6_match.group(2)
-                    # Check if it's a /128 node address in our range but NOT current
-                    if (
-                        prefix_len == "128"
-                        and addr.startswith(ipv6_base.rstrip(":"))
-                        and addr != current_ipv6
-                    ):
-                        logger.info(f"Removing stale IPv6: {addr}/128")
-                        subprocess.run(
-                            ["ip", "-6", "addr", "del", f"{addr}/128", "dev", self.interface],
-                            capture_output=True,
-                        )
-
+                return None
+            return {
+                (info["local"], info["prefixlen"])
+                for link in json.loads(result.stdout)
+                for info in link.get("addr_info", [])
+                if "local" in info
+            }
         except Exception as e:
-            logger.warning(f"Error cleaning up stale addresses: {e}")
+            logger.warning(f"Failed to list {self.interface} addresses: {e}")
+            return None
 
-    def _add_address(self, address: str, description: str) -> bool:
-        """Add an IP address to the interface if not already present."""
-        try:
-            # Check if address already exists
-            check = subprocess.run(
-                ["ip", "addr", "show", self.interface],
-                capture_output=True,
-                text=True,
+    def _stale_addresses(
+        self, current_ipv4: str, current_ipv6: str, existing: Set[Tuple[str, int]]
+    ) -> List[str]:
+        """Find stale node-specific addresses from old node_id.
+
+        Keeps:
+        - The IPv4/IPv6 prefix addresses (for BGP announcement)
+        - The current node-specific addresses
+
+        Returns:
+        - Any other /32 or /128 addresses in the DN42 range, as "addr/len"
+
+        Args:
+            existing: Addresses currently on the interface (_interface_addresses())
+        """
+        stale = []
+        for addr, prefix_len in existing:
+            if prefix_len not in (32, 128):
+                continue
+            ip = ipaddress.ip_address(addr)
+
+            # IPv4: a /32 node address in our range but NOT current
+            if ip.version == 4:
+                if prefix_len == 32 and ip in self._ipv4_net and addr != current_ipv4:
+                    stale.append(f"{addr}/32")
+
+            # IPv6: a /128 node address in our range but NOT current
+            elif prefix_len == 128 and ip in self._ipv6_net and addr != current_ipv6:
+                stale.append(f"{addr}/128")
+
+        return stale
+
+    def _apply_changes(self, changes: List[Tuple[str, str]]) -> bool:
+        """Apply ("add" | "del", "addr/len") changes to the interface.
+
+        Uses a netlink socket when pyroute2 is installed, otherwise one
+        `ip -batch` run.
+        """
+        if IPRoute is None:
+            return self._run_batch(
+                [f"addr {op} {addr} dev {self.interface}" for op, addr in changes]
             )
 
-            addr_only = address.split("/")[0]
-            if addr_only in check.stdout:
-                logger.debug(f"{description} {address} already configured")
-                return True
+        ok = True
+        try:
+            with IPRoute() as ipr:
+                index = ipr.link_lookup(ifname=self.interface)[0]
+                for op, addr in changes:
+                    ip, _, plen = addr.partition("/")
+                    try:
+                        ipr.addr(op, index=index, address=ip, prefixlen=int(plen))
+                    except NetlinkError as e:
+                        if e.code != errno.EEXIST:
+                            logger.warning(f"Failed to {op} {addr} on {self.interface}: {e}")
+                            ok = False
+            return ok
 
-            # Add address
+        except Exception as e:
+            logger.error(f"Error configuring {self.interface}: {e}")
+            return False
+
+    def _run_batch(self, commands: List[str]) -> bool:
+        """Apply `ip` commands to the interface in one `ip -force -batch` run.
+
+        -force keeps going past a failed line, so one bad address doesn't
+        block the rest. An address that already exists ("File exists") is
+        not treated as a failure.
+        """
+        try:
             result = subprocess.run(
-                ["ip", "addr", "add", address, "dev", self.interface],
+                ["ip", "-force", "-batch", "-"],
+                input="\n".join(commands) + "\n",
                 capture_output=True,
                 text=True,
             )
-
-            if result.returncode == 0:
-                logger.info(f"Added {description}: {address}")
-                return True
-            elif "exists" in result.stderr.lower():
-                logger.debug(f"{description} {address} already exists")
-                return True
-            else:
-                logger.warning(f"Failed to add {description}: {result.stderr}")
+            if result.returncode != 0 and "exists" not in result.stderr.lower():
+                logger.warning(f"Failed to configure {self.interface}: {result.stderr.strip()}")
                 return False
+            return True
 
         except Exception as e:
-            logger.error(f"Error adding {description} {address}: {e}")
+            logger.error(f"Error configuring {self.interface}: {e}")
             return False
 
     def ensure_interface_up(self) -> bool:
         """Ensure dummy0 interface exists and is up."""
         try:
-            # Check if interface exists
-            check = subprocess.run(
-                ["ip", "link", "show", self.interface],
-                capture_output=True,
-            )
-
-            if check.returncode != 0:
+            if not interface_exists(self.interface):
                 # Create interface
                 subprocess.run(
                     ["ip", "link", "add", self.interface, "type", "dummy"],
                     capture_output=True,
                 )
 
-            # Bring interface up
-            subprocess.run(
-                ["ip", "link", "set", self.interface, "up"],
-                capture_output=True,
-            )
+            # Bring interface up if not already
+            if not interface_is_up(self.interface):
+                subprocess.run(
+                    ["ip", "link", "set", self.interface, "up"],
+                    capture_output=True,
+                )
 
             return True
         except Exception as e:
@@ -1,14 +1,44 @@
 """MoeNet DN42 Agent - WireGuard Executor"""
 
+import asyncio
 import logging
 import os
 import subprocess
 from pathlib import Path
 
+from core.files import write_private_file
+from core.wgkeys import derive_public_key, generate_private_key
+from services.network import SYS_CLASS_NET, interface_exists, interface_is_up
+
 logger = logging.getLogger(__name__)
 
 
+def _split_wg_config(content: str) -> tuple[dict, str | None]:
+    """Split a WireGuard config into interface settings and the peer section.
+
+    Single pass over the [Interface] lines; everything from [Peer] onwards is
+    returned verbatim for `wg setconf`.
+
+    Returns:
+        Tuple of ({key: value} for [Interface], peer section or None)
+    """
+    peer_start = content.find("[Peer]")
+    interface_part = content[:peer_start] if peer_start >= 0 else content
+
+    settings = {}
+    for line in interface_part.splitlines():
+        if line.startswith("#"):
+            continue
+        key, sep, value = line.partition("=")
+        if sep:
+            settings[key.strip()] = value.strip()
+
+    return settings, content[peer_start:] if peer_start >= 0 else None
+
+
 class WireGuardExecutor:
+    __slots__ = ("config_dir", "_key_path", "private_key", "public_key")
+
     def __init__(self, config_dir: str = "/etc/wireguard", private_key_path: str = None):
         self.config_dir = Path(config_dir)
         self.config_dir.mkdir(parents=True, exist_ok=True)
@@ -24,6 +54,9 @@ class WireGuardExecutor:
     def _load_or_create_key(self) -> tuple[str, str]:
         """Load existing private key or generate a new one.
 
+        The derived public key is cached next to the private key (".pub") so
+        restarts don't need to derive it again.
+
         Returns:
             Tuple of (private_key, public_key)
         """
@@ -31,20 +64,28 @@ class WireGuardExecutor:
             private_key = self._key_path.read_text().strip()
             logger.info(f"Loaded WG private key from {self._key_path}")
         else:
-            # Generate new key
-            result = subprocess.run(["wg", "genkey"], capture_output=True, text=True, check=True)
-            private_key = result.stdout.strip()
+            private_key = generate_private_key()
 
             # Save to file
-            self._key_path.write_text(private_key)
-            os.chmod(self._key_path, 0o600)
+            write_private_file(self._key_path, private_key)
             logger.info(f"Generated new WG private key at {self._key_path}")
 
-        # Derive public key
-        result = subprocess.run(
-            ["wg", "pubkey"], input=private_key, capture_output=True, text=True, check=True
-        )
-        public_key = result.stdout.strip()
+        # Reuse cached public key if it was derived from the current private key
+        pub_path = self._key_path.with_suffix(".pub")
+        try:
+            if pub_path.stat().st_mtime >= self._key_path.stat().st_mtime:
+                public_key = pub_path.read_text().strip()
+                if public_key:
+                    return private_key, public_key
+        except OSError:
+            pass
+
+        public_key = derive_public_key(private_key)
+
+        try:
+            pub_path.write_text(public_key)
+        except OSError as e:
+            logger.debug(f"Failed to cache WG public key: {e}")
 
         return private_key, public_key
 
@@ -62,11 +103,9 @@ class WireGuardExecutor:
             config: WireGuard configuration content
         """
         try:
-            self.config_dir.mkdir(parents=True, exist_ok=True)
             iface = self._interface_name(identifier)
-            path = self.config_dir / f"{iface}.conf"
-            path.write_text(config)
-            os.chmod(path, 0o600)
+            # The config holds the private key
+            write_private_file(self.config_dir / f"{iface}.conf", config)
             return True
         except Exception as e:
             logger.error(f"Write WG config failed: {e}")
@@ -79,20 +118,72 @@ class WireGuardExecutor:
             path.unlink()
         return True
 
-    def up(self, identifier) -> bool:
-        """Bring up WireGuard interface using direct wg commands.
+    def _up_steps(self, iface: str) -> list[tuple[list[str], str | None, bool]]:
+        """Plan the commands that bring up a WireGuard interface from its config.
 
         Uses wg command directly instead of wg-quick to avoid route conflicts
         (wg-quick adds routes for AllowedIPs which can conflict with dummy0 loopback).
 
-        Note: wg setconf doesn't accept PrivateKey, so we need to:
-        1. Extract PrivateKey and ListenPort from config
-        2. Use wg set to configure interface settings
-        3. Use wg setconf with peer-only config (or wg set peer)
+        wg setconf accepts PrivateKey and ListenPort but not the wg-quick
+        Address key, so the config is rebuilt without Address and applied in
+        one `wg setconf` (a single WireGuard netlink set-device request that
+        replaces key, port and peers together). Address is added with ip.
+
+        Forks are kept to a minimum: link creation and bring-up share one
+        `ip -batch`, and all addresses are added by a second one.
+
+        Returns:
+            List of (argv, stdin, check) in execution order; a failing step with
+            check=True aborts the bring-up
         """
-        import re
-        import tempfile
+        config_content = (self.config_dir / f"{iface}.conf").read_text()
+
+        # Extract PrivateKey, ListenPort, Address and the peer section
+        settings, peer_config = _split_wg_config(config_content)
+        private_key = settings.get("PrivateKey")
+        listen_port = settings.get("ListenPort")
+        # Address (for link-local fe80:: addresses), may be a comma-separated list
+        addresses = [a.strip() for a in settings.get("Address", "").split(",") if a.strip()]
+
+        steps = []
+
+        # Create and bring up the link in a single `ip -batch` process
+        ip_batch = []
+        if not interface_exists(iface):
+            ip_batch.append(f"link add {iface} type wireguard")
+        if not interface_is_up(iface):
+            ip_batch.append(f"link set mtu 1420 up dev {iface}")
+        if ip_batch:
+            steps.append((["ip", "-batch", "-"], "\n".join(ip_batch) + "\n", True))
+
+        # Apply key, port and peers in one setconf, fed through stdin so the
+        # private key never touches a temp file
+        wg_config = ["[Interface]"]
+        if private_key:
+            wg_config.append(f"PrivateKey = {private_key}")
+        if listen_port:
+            wg_config.append(f"ListenPort = {listen_port}")
+        wg_config.append("")
+        if peer_config:
+            wg_config.append(peer_config)
+        steps.append((["wg", "setconf", iface, "/dev/stdin"], "\n".join(wg_config), True))
+
+        # Configure Address on interface (important for link-local BGP!)
+        # Not checked: "File exists" just means it is already configured;
+        # -force keeps the batch going past it to the remaining addresses
+        addr_batch = []
+        for address in addresses:
+            # Ensure proper prefix length
+            if "/" not in address:
+                address = f"{address}/64" if ":" in address else f"{address}/32"
+            addr_batch.append(f"addr add {address} dev {iface}")
+        if addr_batch:
+            steps.append((["ip", "-force", "-batch", "-"], "\n".join(addr_batch) + "\n", False))
+
+        return steps
 
+    def up(self, identifier) -> bool:
+        """Bring up WireGuard interface using direct wg commands."""
         iface = self._interface_name(identifier)
         config_path = self.config_dir / f"{iface}.conf"
 
@@ -101,101 +192,60 @@ class WireGuardExecutor:
             return False
 
         try:
-            # Parse config file
-            config_content = config_path.read_text()
-
-            # Extract PrivateKey
-            private_key_match = re.search(r"PrivateKey\s*=\s*(\S+)", config_content)
-            private_key = private_key_match.group(1) if private_key_match else None
-
-            # Extract ListenPort
-            listen_port_match = re.search(r"ListenPort\s*=\s*(\d+)", config_content)
-            listen_port = listen_port_match.group(1) if listen_port_match else None
-
-            # Extract peer section (everything from [Peer] onwards)
-            peer_match = re.search(r"(\[Peer\].*)", config_content, re.DOTALL)
-            peer_config = peer_match.group(1) if peer_match else None
-
-            # Extract Address (for link-local fe80:: addresses)
-            address_match = re.search(r"Address\s*=\s*(\S+)", config_content)
-            address = address_match.group(1) if address_match else None
-
-            # Check if interface already exists
-            check = subprocess.run(["ip", "link", "show", iface], capture_output=True)
-            interface_exists = check.returncode == 0
-
-            if not interface_exists:
-                # Create new interface
-                subprocess.run(["ip", "link", "add", iface, "type", "wireguard"], check=True)
-
-            # Set peer config via temp file (peers-only config for setconf)
-            # NOTE: setconf MUST come FIRST, as it resets all interface settings!
-            if peer_config:
-                with tempfile.NamedTemporaryFile(mode="w", delete=False, suffix=".conf") as f:
-                    f.write(peer_config)
-                    peer_conf_file = f.name
-                try:
-                    subprocess.run(["wg", "setconf", iface, peer_conf_file], check=True)
-                finally:
-                    import os
-
-                    os.unlink(peer_conf_file)
-
-            # Set private key AFTER setconf (setconf resets it!)
-            if private_key:
-                with tempfile.NamedTemporaryFile(mode="w", delete=False, suffix=".key") as f:
-                    f.write(private_key)
-                    key_file = f.name
-                try:
-                    subprocess.run(["wg", "set", iface, "private-key", key_file], check=True)
-                finally:
-                    import os
-
-                    os.unlink(key_file)
-
-            # Set listen port AFTER setconf (setconf resets it!)
-            if listen_port:
-                subprocess.run(["wg", "set", iface, "listen-port", listen_port], check=True)
-
-            # Bring interface up if not already
-            if not interface_exists:
-                subprocess.run(["ip", "link", "set", "mtu", "1420", "up", "dev", iface], check=True)
-
-            # Configure Address on interface (important for link-local BGP!)
-            if address:
-                # Check if address already configured
-                family = "-6" if ":" in address else "-4"
-                addr_check = subprocess.run(
-                    ["ip", family, "addr", "show", "dev", iface], capture_output=True, text=True
-                )
-                addr_only = address.split("/")[0]
-                if addr_only not in addr_check.stdout:
-                    # Ensure proper prefix length
-                    if "/" not in address:
-                        address = f"{address}/64" if ":" in address else f"{address}/32"
-                    subprocess.run(
-                        ["ip", family, "addr", "add", address, "dev", iface],
-                        capture_output=True,  # Ignore errors if already exists
-                    )
-                    logger.info(f"Configured address {address} on {iface}")
+            for argv, stdin, check in self._up_steps(iface):
+                subprocess.run(argv, input=stdin, capture_output=True, text=True, check=check)
 
             logger.info(f"Configured {iface}")
             return True
 
         except subprocess.CalledProcessError as e:
-            logger.error(f"Failed to bring up {iface}: {e}")
+            logger.error(f"Failed to bring up {iface}: {e} {e.stderr}")
             return False
         except Exception as e:
             logger.error(f"Error bringing up {iface}: {e}")
             return False
 
+    async def up_async(self, identifier) -> bool:
+        """Bring up WireGuard interface without blocking the event loop.
+
+        Same commands as up(), run with asyncio subprocesses so several
+        interfaces can be brought up concurrently with asyncio.gather().
+        """
+        iface = self._interface_name(identifier)
+        config_path = self.config_dir / f"{iface}.conf"
+
+        if not config_path.exists():
+            logger.error(f"Config file not found: {config_path}")
+            return False
+
+        try:
+            for argv, stdin, check in self._up_steps(iface):
+                proc = await asyncio.create_subprocess_exec(
+                    *argv,
+                    stdin=asyncio.subprocess.DEVNULL if stdin is None else asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.DEVNULL,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+                _, stderr = await proc.communicate(None if stdin is None else stdin.encode())
+                if check and proc.returncode != 0:
+                    logger.error(
+                        f"Failed to bring up {iface}: {argv[0]} exited {proc.returncode} "
+                        f"{stderr.decode(errors='replace').strip()}"
+                    )
+                    return False
+
+            logger.info(f"Configured {iface}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error bringing up {iface}: {e}")
+            return False
+
     def down(self, identifier) -> bool:
         """Bring down WireGuard interface using direct commands."""
         iface = self._interface_name(identifier)
         try:
-            # Check if interface exists
-            check = subprocess.run(["ip", "link", "show", iface], capture_output=True)
-            if check.returncode == 0:
+            if interface_exists(iface):
                 subprocess.run(["ip", "link", "del", iface], capture_output=True)
                 logger.info(f"Removed interface {iface}")
         except Exception as e:
@@ -203,10 +253,10 @@ class WireGuardExecutor:
         return True
 
     def get_status(self) -> dict:
-        result = subprocess.run(["wg", "show", "interfaces"], capture_output=True, text=True)
-        if result.returncode != 0:
+        # Read interface names from sysfs rather than forking `wg show interfaces`
+        try:
+            names = os.listdir(SYS_CLASS_NET)
+        except OSError:
             return {"interfaces": 0}
-        interfaces = [
-            i for i in result.stdout.split() if i.startswith("dn42-") or i.startswith("wg-")
-        ]
+        interfaces = sorted(i for i in names if i.startswith(("dn42-", "wg-")))
         return {"interfaces": len(interfaces), "names": interfaces}
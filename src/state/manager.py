@@ -5,12 +5,27 @@ MoeNet DN42 Agent - State Manager
 import json
 import logging
 import os
-from datetime import datetime
+import threading
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional
 
+try:
+    import orjson
+except ImportError:  # optional dependency, stdlib json is used instead
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# Seconds to batch high-frequency updates (health) before they are written out;
+# applied config, config_seq and node_id are written immediately
+SAVE_DELAY = 1.0
+
+
+def _iso_now() -> str:
+    """Current UTC time as ISO 8601 with a Z suffix."""
+    return datetime.now(timezone.utc).isoformat().removesuffix("+00:00") + "Z"
+
 
 class StateManager:
     """Manages last_state.json persistence."""
@@ -18,6 +33,9 @@ class StateManager:
     def __init__(self, state_path: str = "/var/lib/moenet-agent/last_state.json"):
         self.state_path = Path(state_path)
         self._state: Optional[dict] = None
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._save_timer: Optional[threading.Timer] = None
 
     def load(self) -> dict:
         if self._state is not None:
@@ -25,8 +43,8 @@ class StateManager:
 
         if self.state_path.exists():
             try:
-                with open(self.state_path) as f:
-                    self._state = json.load(f)
+                raw = self.state_path.read_bytes()
+                self._state = orjson.loads(raw) if orjson else json.loads(raw)
             except Exception as e:
                 logger.error(f"Failed to load state: {e}")
                 self._state = self._empty_state()
@@ -35,48 +53,95 @@ class StateManager:
         return self._state
 
     def save(self) -> bool:
-        if self._state is None:
-            return False
-        try:
-            self.state_path.parent.mkdir(parents=True, exist_ok=True)
-            self._state["last_update"] = datetime.utcnow().isoformat() + "Z"
-            temp = self.state_path.with_suffix(".tmp")
-            with open(temp, "w") as f:
-                json.dump(self._state, f, indent=2)
-            os.replace(temp, self.state_path)
-            return True
-        except Exception as e:
-            logger.error(f"Failed to save state: {e}")
-            return False
+        """Write pending changes to disk and cancel the pending save timer.
+
+        No-op if nothing changed since the last save. Call on shutdown so
+        debounced updates aren't lost.
+        """
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if self._state is None:
+                return False
+            if not self._dirty:
+                return True
+            try:
+                self.state_path.parent.mkdir(parents=True, exist_ok=True)
+                self._state["last_update"] = _iso_now()
+                temp = self.state_path.with_suffix(".tmp")
+                if orjson:
+                    temp.write_bytes(orjson.dumps(self._state, option=orjson.OPT_INDENT_2))
+                else:
+                    temp.write_text(json.dumps(self._state, indent=2))
+                os.replace(temp, self.state_path)
+                self._dirty = False
+                return True
+            except Exception as e:
+                logger.error(f"Failed to save state: {e}")
+                return False
+
+    def _mark_dirty(self) -> None:
+        """Flag the state as modified and schedule one save for the whole burst.
+
+        Only for high-frequency updates; others set _dirty and call save().
+
+        Must be called with self._lock held.
+        """
+        self._dirty = True
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(SAVE_DELAY, self.save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
 
     def get_config_hash(self) -> Optional[str]:
         return self.load().get("config_version_hash")
 
+    def get_applied_seq(self) -> Optional[int]:
+        """Control-plane config_seq of the last fully applied config."""
+        return self.load().get("config_seq")
+
+    def set_applied_seq(self, config_seq: int) -> None:
+        state = self.load()
+        with self._lock:
+            if state.get("config_seq") == config_seq:
+                return
+            state["config_seq"] = config_seq
+            self._dirty = True
+        # Applied state is flushed right away so a crash can't lose it
+        self.save()
+
     def get_applied_peers(self) -> list:
         return self.load().get("applied_config", {}).get("peers", [])
 
     def update_applied_config(self, peers: list, config_hash: str) -> None:
         state = self.load()
-        if state.get("applied_config"):
-            state["rollback_snapshot"] = {
-                "previous_hash": state.get("config_version_hash"),
-                "created_at": datetime.utcnow().isoformat() + "Z",
+        now = _iso_now()
+        with self._lock:
+            if state.get("applied_config"):
+                state["rollback_snapshot"] = {
+                    "previous_hash": state.get("config_version_hash"),
+                    "created_at": now,
+                }
+            state["config_version_hash"] = config_hash
+            state["applied_config"] = {
+                "peers": peers,
+                "applied_at": now,
             }
-        state["config_version_hash"] = config_hash
-        state["applied_config"] = {
-            "peers": peers,
-            "applied_at": datetime.utcnow().isoformat() + "Z",
-        }
+            self._dirty = True
         self.save()
 
     def update_health(self, health: dict) -> None:
         state = self.load()
-        state["health_status"] = {**health, "last_check": datetime.utcnow().isoformat() + "Z"}
-        self.save()
+        with self._lock:
+            state["health_status"] = {**health, "last_check": _iso_now()}
+            self._mark_dirty()
 
     def set_node_id(self, node_id: str) -> None:
         state = self.load()
-        state["node_id"] = node_id
+        with self._lock:
+            state["node_id"] = node_id
+            self._dirty = True
         self.save()
 
     def get_full_state(self) -> dict:
@@ -86,7 +151,7 @@ class StateManager:
         return {
             "version": "2.1.0",
             "node_id": None,
-            "last_update": datetime.utcnow().isoformat() + "Z",
+            "last_update": _iso_now(),
             "config_version_hash": None,
             "applied_config": {"peers": []},
             "health_status": {},
@@ -12,7 +12,7 @@ from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Dict, List, Optional
 
-from .constants import latency_to_tier
+from services.community_constants import latency_to_tier
 
 logger = logging.getLogger(__name__)
 
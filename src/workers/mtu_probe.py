@@ -10,35 +10,85 @@ Usage:
 """
 
 import asyncio
+import itertools
 import logging
+import os
+import socket
+import struct
+import time
 from dataclasses import dataclass, field
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
 
-# MTU values to test (descending order)
-MTU_TEST_VALUES = [1420, 1400, 1380, 1320, 1280]
+# Largest MTU worth probing (WireGuard default)
+MAX_MTU = 1420
 
 # Minimum safe MTU (IPv6 minimum)
 MIN_MTU = 1280
 
+# Stop the search once the known-good and known-bad bounds are this close
+MTU_SEARCH_GRANULARITY = 10
+
 # Overhead for ICMP/IP headers
 ICMP_OVERHEAD = 28
 
+# Path MTU discovery socket options (linux/in.h, linux/in6.h): always set DF
+IP_MTU_DISCOVER = 10
+IPV6_MTU_DISCOVER = 23
+PMTUDISC_DO = 2
+
+# ICMP echo types: (request, reply) per address family
+ICMP_ECHO = {socket.AF_INET: (8, 0), socket.AF_INET6: (128, 129)}
+
+# Echo sequence numbers, unique per probe so concurrent probes can tell replies apart
+_echo_seq = itertools.count(1)
+
+
+def _icmp_checksum(data: bytes) -> int:
+    """RFC 1071 Internet checksum."""
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _open_icmp_socket(family: int) -> Optional[socket.socket]:
+    """Open a non-blocking ICMP socket with DF set, or None if not permitted.
 
-@dataclass
+    Prefers an unprivileged ping socket (net.ipv4.ping_group_range) and falls
+    back to a raw socket, which the agent can open as root.
+    """
+    proto = socket.IPPROTO_ICMP if family == socket.AF_INET else socket.IPPROTO_ICMPV6
+    for sock_type in (socket.SOCK_DGRAM, socket.SOCK_RAW):
+        try:
+            sock = socket.socket(family, sock_type, proto)
+        except OSError:
+            continue
+        if family == socket.AF_INET:
+            sock.setsockopt(socket.IPPROTO_IP, IP_MTU_DISCOVER, PMTUDISC_DO)
+        else:
+            sock.setsockopt(socket.IPPROTO_IPV6, IPV6_MTU_DISCOVER, PMTUDISC_DO)
+        sock.setblocking(False)
+        return sock
+    return None
+
+
+@dataclass(slots=True, frozen=True)
 class MTUProbeResult:
     """Result of MTU probe."""
 
     target: str
     optimal_mtu: int
-    tested_at: float  # timestamp
+    tested_at: float  # time.monotonic() of the probe
     is_intercontinental: bool = False
     is_low_mtu: bool = False  # MTU < 1400
 
 
-@dataclass
+@dataclass(slots=True)
 class MTUProbe:
     """Probe path MTU to mesh peers."""
 
@@ -48,6 +98,9 @@ class MTUProbe:
     # Timeout for each ping
     timeout: float = 5.0
 
+    # Seconds a probe result stays valid
+    cache_ttl: float = 3600.0
+
     async def probe_mtu(self, target: str, is_intercontinental: bool = False) -> MTUProbeResult:
         """
         Probe the optimal MTU to a target.
@@ -59,26 +112,48 @@ class MTUProbe:
         Returns:
             MTUProbeResult with optimal MTU
         """
-        import time
-
-        optimal_mtu = MIN_MTU
-
-        for mtu in MTU_TEST_VALUES:
-            packet_size = mtu - ICMP_OVERHEAD
-
-            if await self._ping_with_size(target, packet_size):
-                optimal_mtu = mtu
-                break  # Found working MTU
+        cached = self._fresh_result(target)
+        if cached is not None:
+            return cached
+
+        # Resolve once; the address is both the ping destination and a
+        # second cache key, so a host probed by name and by IP shares a result
+        resolved = await self._resolve(target)
+        if resolved is None:
+            optimal_mtu = MIN_MTU
+        else:
+            family, address = resolved
+            cached = self._fresh_result(address)
+            if cached is not None:
+                self.cache[target] = cached
+                return cached
+
+            # Most paths carry the full size, so try it first; otherwise binary
+            # search between MIN_MTU (assumed to work) and the largest failed size
+            # (RFC 4821 style search)
+            if await self._ping_with_size(address, family, MAX_MTU - ICMP_OVERHEAD):
+                optimal_mtu = MAX_MTU
+            else:
+                lo, hi = MIN_MTU, MAX_MTU - 1
+                while hi - lo >= MTU_SEARCH_GRANULARITY:
+                    mid = (lo + hi + 1) // 2
+                    if await self._ping_with_size(address, family, mid - ICMP_OVERHEAD):
+                        lo = mid
+                    else:
+                        hi = mid - 1
+                optimal_mtu = lo
 
         result = MTUProbeResult(
             target=target,
             optimal_mtu=optimal_mtu,
-            tested_at=time.time(),
+            tested_at=time.monotonic(),
             is_intercontinental=is_intercontinental,
             is_low_mtu=(optimal_mtu < 1400),
         )
 
         self.cache[target] = result
+        if resolved is not None:
+            self.cache[resolved[1]] = result
 
         logger.info(
             f"MTU probe {target}: {optimal_mtu} "
@@ -87,21 +162,77 @@ class MTUProbe:
 
         return result
 
-    async def _ping_with_size(self, target: str, size: int) -> bool:
+    async def _resolve(self, target: str) -> Optional[Tuple[int, str]]:
+        """Resolve target to (address family, IP address), or None on failure."""
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(
+                target, None, type=socket.SOCK_DGRAM
+            )
+        except OSError as e:
+            logger.warning(f"MTU probe: cannot resolve {target}: {e}")
+            return None
+        family, _, _, _, sockaddr = infos[0]
+        return family, sockaddr[0]
+
+    async def _ping_with_size(self, target: str, family: int, size: int) -> bool:
         """
         Ping target with specific packet size and DF flag.
 
+        Sends the echo request from an in-process ICMP socket; the ping
+        binary is only used if no ICMP socket can be opened.
+
         Args:
-            target: Target to ping
+            target: IP address to ping
+            family: Address family of target (socket.AF_INET or AF_INET6)
             size: Packet size (excluding IP/ICMP headers)
 
         Returns:
             True if ping succeeded, False otherwise
         """
-        # Determine if IPv6
-        is_ipv6 = ":" in target
-
-        if is_ipv6:
+        sock = _open_icmp_socket(family)
+        if sock is None:
+            return await self._ping_subprocess(target, family, size)
+
+        request_type, reply_type = ICMP_ECHO[family]
+        ident = os.getpid() & 0xFFFF
+        seq = next(_echo_seq) & 0xFFFF
+        payload = bytes(size)
+        header = struct.pack("!BBHHH", request_type, 0, 0, ident, seq)
+        # Kernel fills in the checksum for ICMPv6 and ping sockets; needed for raw IPv4
+        checksum = _icmp_checksum(header + payload) if family == socket.AF_INET else 0
+        packet = struct.pack("!BBHHH", request_type, 0, checksum, ident, seq) + payload
+
+        loop = asyncio.get_running_loop()
+        with sock:
+            try:
+                await loop.sock_sendto(sock, packet, (target, 0))
+                deadline = loop.time() + self.timeout
+                while (remaining := deadline - loop.time()) > 0:
+                    data = await asyncio.wait_for(loop.sock_recv(sock, 65535), remaining)
+                    # Raw IPv4 sockets deliver the IP header too
+                    if sock.type == socket.SOCK_RAW and family == socket.AF_INET:
+                        data = data[(data[0] & 0x0F) * 4 :]
+                    if len(data) < 8:
+                        continue
+                    r_type, _, _, r_ident, r_seq = struct.unpack("!BBHHH", data[:8])
+                    # Ping sockets rewrite the identifier; the kernel filters those for us
+                    if (
+                        r_type == reply_type
+                        and r_seq == seq
+                        and (sock.type == socket.SOCK_DGRAM or r_ident == ident)
+                    ):
+                        return True
+                return False
+            except asyncio.TimeoutError:
+                return False
+            except OSError as e:
+                # EMSGSIZE: larger than the known path MTU
+                logger.debug(f"Ping failed for {target} size={size}: {e}")
+                return False
+
+    async def _ping_subprocess(self, target: str, family: int, size: int) -> bool:
+        """Ping using the ping binary (fallback when ICMP sockets aren't permitted)."""
+        if family == socket.AF_INET6:
             cmd = ["ping6", "-c", "1", "-W", str(int(self.timeout)), "-s", str(size), target]
         else:
             # -M do = set DF flag (don't fragment)
@@ -124,7 +255,11 @@ class MTUProbe:
                 stdout=asyncio.subprocess.DEVNULL,
                 stderr=asyncio.subprocess.DEVNULL,
             )
-            await asyncio.wait_for(proc.wait(), timeout=self.timeout + 1)
+            try:
+                await asyncio.wait_for(proc.wait(), timeout=self.timeout + 1)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                proc.kill()
+                raise
             return proc.returncode == 0
         except asyncio.TimeoutError:
             return False
@@ -132,14 +267,21 @@ class MTUProbe:
             logger.debug(f"Ping failed for {target} size={size}: {e}")
             return False
 
+    def _fresh_result(self, target: str) -> Optional[MTUProbeResult]:
+        """Get the cached result for target if it is younger than cache_ttl."""
+        result = self.cache.get(target)
+        if result and time.monotonic() - result.tested_at < self.cache_ttl:
+            return result
+        return None
+
     def get_cached_mtu(self, target: str) -> Optional[int]:
         """Get cached MTU for target if available."""
-        result = self.cache.get(target)
+        result = self._fresh_result(target)
         return result.optimal_mtu if result else None
 
     def should_use_low_mtu(self, target: str) -> bool:
         """Check if target should use low MTU based on cache."""
-        result = self.cache.get(target)
+        result = self._fresh_result(target)
         return result.is_low_mtu if result else False
 
 
@@ -1,19 +1,66 @@
 """MoeNet DN42 Agent - Sync Daemon"""
 
 import asyncio
+import hashlib
+import json
 import logging
-
-from services.firewall import FirewallExecutor
+import os
+from functools import lru_cache
 
 from integrations.control_plane import ControlPlaneClient
 from renderer.bird import BirdRenderer
 from renderer.wireguard import WireGuardRenderer
 from services.bird import BirdExecutor
+from services.network import FirewallExecutor, interface_is_up
 from services.wireguard import WireGuardExecutor
 from state.manager import StateManager
 
+try:
+    from xxhash import xxh3_128
+except ImportError:  # optional dependency, hashlib's blake2b is used instead
+    xxh3_128 = None
+
 logger = logging.getLogger(__name__)
 
+# Full mesh re-apply interval while the mesh config is unchanged (safety net)
+MESH_RESYNC_INTERVAL = 3600
+# Seconds between full `wg.up` passes over unchanged tunnels; in between they
+# are only brought up again if sysfs shows the link down
+INTERFACE_RECONCILE_INTERVAL = 300
+
+# Peer config hashes persisted next to last_state.json across restarts
+PEER_HASH_MANIFEST = "peer_hashes.json"
+CONFIG_HASH_NAME = "xxh3_128" if xxh3_128 is not None else "blake2b-128"
+
+
+def _config_hash(data: bytes) -> bytes:
+    """Digest for detecting config changes (not a security property)."""
+    if xxh3_128 is not None:
+        return xxh3_128(data).digest()
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _next_deadline(deadline: float, interval: float, now: float) -> float:
+    """Advance a periodic deadline past now, skipping ticks missed by a slow run."""
+    return deadline + interval * ((now - deadline) // interval + 1)
+
+
+# (first ASN, last ASN, base port) for the WireGuard listen port ranges
+LISTEN_PORT_RANGES = (
+    (4242420000, 4242429999, 30000),
+    (4201270000, 4201279999, 40000),
+)
+DEFAULT_LISTEN_PORT_BASE = 50000
+
+
+@lru_cache(maxsize=4096)
+def _calculate_listen_port(remote_as: int) -> int:
+    """Calculate WireGuard listen port based on remote ASN."""
+    for first, last, base in LISTEN_PORT_RANGES:
+        if first <= remote_as <= last:
+            return base + (remote_as % 10000)
+    return DEFAULT_LISTEN_PORT_BASE + (remote_as % 10000)
+
 
 class SyncDaemon:
     def __init__(
@@ -38,8 +85,28 @@ class SyncDaemon:
         self.sync_interval = sync_interval
         self.heartbeat_interval = heartbeat_interval
         self._running = False
+        # ASN -> (WG config hash, BIRD config hash) of what was last seen on disk,
+        # warm-started from the manifest so a restart doesn't re-read every config
+        self._manifest_path = self.state.state_path.parent / PEER_HASH_MANIFEST
+        self._peer_hash_cache: dict[int, tuple[bytes, bytes]] = self._load_manifest()
+        self._manifest_saved = dict(self._peer_hash_cache)
+        # ASN -> control-plane peer "version" last applied
+        self._peer_versions: dict[int, int] = {}
+        # Whether this process has rendered every peer once. Until it has, a
+        # persisted config_seq is not trusted: the agent may have been upgraded
+        # with new templates that the cached hashes don't reflect.
+        self._rendered_all = False
+        # ASNs whose interface this process brought up, and when to forget
+        # them so every tunnel gets a full `wg.up` again
+        self._up_interfaces: set[int] = set()
+        self._next_reconcile = 0.0
 
     async def sync_config(self) -> bool:
+        """Fetch and apply the peer config.
+
+        Returns:
+            False if no config was received, else True
+        """
         logger.info("Syncing config from control-plane...")
         config = await self.client.get_config()
         if not config:
@@ -50,8 +117,6 @@ class SyncDaemon:
         ibgp_count = len(config.get("ibgp_peers", []))
         logger.info(f"Received config: {ebgp_count} eBGP peers, {ibgp_count} iBGP peers")
 
-        remote_hash = config.get("version_hash") or self.client.compute_config_hash(config)
-
         # iBGP sync is now handled by ibgp_sync.py in main.py
         # Commenting out to avoid conflict with new ibgp_sync module
         # ibgp_peers = config.get("ibgp_peers", [])
@@ -59,28 +124,173 @@ class SyncDaemon:
         #     local_ipv6 = config.get("local_ipv6") or config.get("node_info", {}).get("dn42_ipv6")
         #     self._sync_ibgp(ibgp_peers, local_ipv6=local_ipv6)
 
-        # Always check all peers - _add_peer uses hash comparison for efficiency
-        current = {p["asn"] for p in self.state.get_applied_peers()}
-        new_peers = {p["asn"] for p in config.get("peers", [])}
-
-        # Track if any changes were made
-
-        for peer in config.get("peers", []):
-            self._add_peer(peer)
-
-        for asn in current - new_peers:
-            self._remove_peer(asn)
+        # Read the applied state once; it's only written back at the end
+        applied_peers = self.state.get_applied_peers()
+        applied_seq = self.state.get_applied_seq()
+        applied_hash = self.state.get_config_hash()
+
+        # Index the new and the last applied peers by ASN once; the key views
+        # give added/removed peers without rebuilding sets
+        new_by_asn = {p["asn"]: p for p in config.get("peers", [])}
+        applied_by_asn = {p["asn"]: p for p in applied_peers}
+
+        # Skip rendering and diffing peers the control plane reports unchanged:
+        # the whole config (config_seq) or the peer itself (version) matches
+        # what was applied. Peers missing from the hash cache (never applied,
+        # or a failed write) are always processed, and so is every peer on the
+        # first sync after start.
+        config_seq = config.get("config_seq")
+        seq_unchanged = self._rendered_all and config_seq is not None and config_seq == applied_seq
+        peers, unchanged = [], []
+        for asn, peer in new_by_asn.items():
+            version = peer.get("version")
+            if asn in self._peer_hash_cache and (
+                seq_unchanged or (version is not None and self._peer_versions.get(asn) == version)
+            ):
+                unchanged.append(peer)
+            else:
+                peers.append(peer)
+
+        # Render every peer up front in one pass over the compiled templates,
+        # off the event loop so heartbeats aren't held up
+        rendered = await asyncio.to_thread(self._render_peers, peers)
+
+        now = asyncio.get_running_loop().time()
+        if now >= self._next_reconcile:
+            self._up_interfaces.clear()
+            self._next_reconcile = now + INTERFACE_RECONCILE_INTERVAL
+
+        firewall_ports = []
+        # Peers are independent (own files and interface), so overlap their
+        # disk and wg/ip subprocess work in worker threads
+        results = await asyncio.gather(
+            *(
+                asyncio.to_thread(self._add_peer, peer, expected_wg, expected_bird, firewall_ports)
+                for peer, (expected_wg, expected_bird) in zip(peers, rendered)
+            ),
+            # Unchanged tunnels are only brought up if not known to be up
+            *(
+                asyncio.to_thread(self._bring_up, peer["asn"])
+                for peer in unchanged
+                if peer.get("tunnel", {}).get("type") == "wireguard"
+                and not self._is_up(peer["asn"])
+            ),
+        )
+        bird_updates = {
+            peer["asn"]: bird_config
+            for peer, bird_config in zip(peers, results)
+            if bird_config is not None
+        }
 
-        # Only reload BIRD if hash changed (implies config changes)
-        if remote_hash != self.state.get_config_hash():
+        if firewall_ports:
+            logger.info(f"Updated {len(firewall_ports)} WireGuard peer configs")
+
+        # Write changed BIRD peer configs in one batch
+        if bird_updates:
+            if self.bird.write_peers(bird_updates):
+                # One summary line per sync instead of one per peer
+                logger.info(f"Updated {len(bird_updates)} BIRD peer configs")
+                logger.debug(f"Updated BIRD configs for AS{sorted(bird_updates)}")
+            else:
+                # Cached hashes assumed the write; re-read the files next sync
+                for asn in bird_updates:
+                    self._peer_hash_cache.pop(asn, None)
+
+        # A peer counts as applied at its version once its hashes are cached
+        for peer in peers:
+            if peer.get("version") is not None and peer["asn"] in self._peer_hash_cache:
+                self._peer_versions[peer["asn"]] = peer["version"]
+
+        # Tear down removed peers concurrently (each is an `ip link del` fork)
+        removed = sorted(applied_by_asn.keys() - new_by_asn.keys())
+        if removed:
+            await asyncio.gather(*(asyncio.to_thread(self._remove_peer, asn) for asn in removed))
+
+        # When tunnels were updated or removed, reconcile the firewall with the
+        # ports of all current tunnels in one batch: one listing, then one
+        # restore transaction per family to open and one to close ports
+        if firewall_ports or removed:
+            self.firewall.sync_ports(
+                sorted(
+                    peer.get("listen_port") or _calculate_listen_port(asn)
+                    for asn, peer in new_by_asn.items()
+                    if peer.get("tunnel", {}).get("type") == "wireguard"
+                )
+            )
+
+        # Without a control-plane version_hash, identify the config by the
+        # hashes of what was rendered for it, folded in peer order; a peer
+        # whose write failed has no cached hashes and so changes the result
+        remote_hash = config.get("version_hash")
+        if not remote_hash:
+            manifest = hashlib.blake2b(digest_size=16)
+            for asn in new_by_asn:
+                wg_hash, bird_hash = self._peer_hash_cache.get(asn, (b"", b""))
+                manifest.update(asn.to_bytes(8, "big") + wg_hash + bird_hash)
+            remote_hash = f"blake2b:{manifest.hexdigest()}"
+
+        if config_seq is not None:
+            # Flushed to disk immediately; keep the write off the event loop
+            await asyncio.to_thread(self.state.set_applied_seq, config_seq)
+        self._rendered_all = True
+
+        # Persist the hash cache once per sync, only if it changed
+        if self._peer_hash_cache != self._manifest_saved:
+            snapshot = dict(self._peer_hash_cache)
+            if await asyncio.to_thread(self._save_manifest, snapshot):
+                self._manifest_saved = snapshot
+
+        # Reload BIRD once for the whole batch, only if something changed.
+        # Rewritten peer files count too: with a control-plane version_hash a
+        # template change alters them without changing the hash.
+        changed = remote_hash != applied_hash
+        if changed or bird_updates:
             self.bird.reload()
-            self.state.update_applied_config(config.get("peers", []), remote_hash)
+        if changed:
+            await asyncio.to_thread(
+                self.state.update_applied_config, config.get("peers", []), remote_hash
+            )
             logger.info("Config sync complete")
         else:
             logger.debug("Config up to date")
 
         return True
 
+    def _load_manifest(self) -> dict[int, tuple[bytes, bytes]]:
+        """Load persisted peer config hashes; empty if missing or made by another hash."""
+        try:
+            data = json.loads(self._manifest_path.read_text())
+            if data.get("hash") != CONFIG_HASH_NAME:
+                return {}
+            return {
+                int(asn): (bytes.fromhex(wg_hash), bytes.fromhex(bird_hash))
+                for asn, (wg_hash, bird_hash) in data["peers"].items()
+            }
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Ignoring peer hash manifest {self._manifest_path}: {e}")
+            return {}
+
+    def _save_manifest(self, hashes: dict[int, tuple[bytes, bytes]]) -> bool:
+        """Atomically write peer config hashes to the manifest."""
+        data = {
+            "hash": CONFIG_HASH_NAME,
+            "peers": {
+                str(asn): [wg_hash.hex(), bird_hash.hex()]
+                for asn, (wg_hash, bird_hash) in hashes.items()
+            },
+        }
+        try:
+            self._manifest_path.parent.mkdir(parents=True, exist_ok=True)
+            temp = self._manifest_path.with_suffix(".tmp")
+            temp.write_text(json.dumps(data))
+            os.replace(temp, self._manifest_path)
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to save peer hash manifest: {e}")
+            return False
+
     def _sync_ibgp(self, ibgp_peers: list, local_ipv6: str = None):
         """Sync iBGP peer configurations."""
         from renderer.ibgp import render_ibgp_config
@@ -98,56 +308,106 @@ class SyncDaemon:
         )
         self.bird.write_ibgp(ibgp_config)
 
-    def _add_peer(self, peer: dict):
-        import hashlib
+    def _render_peers(self, peers: list) -> list[tuple[str, str]]:
+        """Render (wireguard, bird) configs for all peers, in peer order."""
+        wg_configs = self.wg_renderer.render_peers(peers, self.wg.private_key)
+        bird_configs = self.bird_renderer.render_peers(peers)
+        return [(wg_configs[peer["asn"]], bird_configs[peer["asn"]]) for peer in peers]
 
+    def _add_peer(
+        self,
+        peer: dict,
+        expected_wg: str,
+        expected_bird: str,
+        firewall_ports: list[int],
+    ) -> str | None:
+        """Apply a peer's rendered WireGuard config and check its BIRD config.
+
+        The listen port of a rewritten tunnel is appended to firewall_ports
+        for the caller to reconcile in one batch.
+
+        Returns:
+            The BIRD config if it differs from the file on disk (written by
+            the caller in one batch), else None
+        """
         asn = peer["asn"]
-        listen_port = peer.get("listen_port") or self._calculate_listen_port(asn)
-
-        # Generate expected configs
-        local_addr = peer.get("bgp", {}).get("request_lla", "")
-        expected_wg = self.wg_renderer.render_interface(peer, self.wg.private_key, local_addr)
-        expected_bird = self.bird_renderer.render_peer(peer)
-
-        wg_path = self.wg.config_dir / f"dn42-{asn}.conf"
-        bird_path = self.bird.config_dir / f"dn42_{asn}.conf"
-
-        # Compare with existing files using hash
-        def file_hash(path) -> str:
-            if path.exists():
-                return hashlib.md5(path.read_text().encode()).hexdigest()
-            return ""
-
-        wg_needs_update = file_hash(wg_path) != hashlib.md5(expected_wg.encode()).hexdigest()
-        bird_needs_update = file_hash(bird_path) != hashlib.md5(expected_bird.encode()).hexdigest()
+        listen_port = peer.get("listen_port") or _calculate_listen_port(asn)
+
+        expected_wg_bytes = expected_wg.encode()
+        expected_bird_bytes = expected_bird.encode()
+        expected_wg_hash = _config_hash(expected_wg_bytes)
+        expected_bird_hash = _config_hash(expected_bird_bytes)
+
+        # Compare against the hashes cached from earlier syncs; the files are
+        # only read on a cold cache (first sync, or after a failed write)
+        cached = self._peer_hash_cache.get(asn)
+        if cached is None:
+
+            def file_hash(path, expected: bytes, expected_hash: bytes) -> bytes:
+                # Configs are small, so compare bytes directly instead of
+                # hashing the file; a file of another size isn't even read
+                try:
+                    if path.stat().st_size != len(expected):
+                        return b""
+                    return expected_hash if path.read_bytes() == expected else b""
+                except FileNotFoundError:
+                    return b""
+
+            cached = (
+                file_hash(
+                    self.wg.config_dir / f"dn42-{asn}.conf", expected_wg_bytes, expected_wg_hash
+                ),
+                file_hash(
+                    self.bird.config_dir / f"dn42_{asn}.conf",
+                    expected_bird_bytes,
+                    expected_bird_hash,
+                ),
+            )
+        wg_hash, bird_hash = cached
+
+        wg_needs_update = wg_hash != expected_wg_hash
+        bird_needs_update = bird_hash != expected_bird_hash
 
         # Update WireGuard if needed
+        wg_write_failed = False
         if peer.get("tunnel", {}).get("type") == "wireguard":
             if wg_needs_update:
-                self.firewall.allow_port(listen_port)
-                self.wg.write_interface(asn, expected_wg)
-                logger.info(f"Updated WG config for AS{asn}")
-            # Always ensure interface is up (even if config unchanged)
-            self.wg.up(asn)
+                firewall_ports.append(listen_port)
+                if self.wg.write_interface(asn, expected_wg):
+                    wg_hash = expected_wg_hash
+                else:
+                    wg_write_failed = True
+                logger.debug(f"Updated WG config for AS{asn}")
+            # Ensure the interface is up; skip the forks if it already is
+            if wg_needs_update or not self._is_up(asn):
+                self._bring_up(asn)
+
+        if wg_write_failed:
+            # Failed WG write: leave uncached so the next sync retries this peer
+            self._peer_hash_cache.pop(asn, None)
+        else:
+            # The BIRD config is written by the caller, which drops this entry if that fails
+            self._peer_hash_cache[asn] = (wg_hash, expected_bird_hash)
 
         # Update BIRD if needed
-        if bird_needs_update:
-            self.bird.write_peer(asn, expected_bird)
-            logger.info(f"Updated BIRD config for AS{asn}")
-
-    def _calculate_listen_port(self, remote_as: int) -> int:
-        """Calculate WireGuard listen port based on remote ASN."""
-        if 4242420000 <= remote_as <= 4242429999:
-            return 30000 + (remote_as % 10000)
-        elif 4201270000 <= remote_as <= 4201279999:
-            return 40000 + (remote_as % 10000)
+        return expected_bird if bird_needs_update else None
+
+    def _is_up(self, asn: int) -> bool:
+        """Whether a peer's interface was brought up by us and is still up."""
+        return asn in self._up_interfaces and interface_is_up(f"dn42-{asn}")
+
+    def _bring_up(self, asn: int) -> None:
+        """Bring up a peer's WireGuard interface and remember whether it worked."""
+        if self.wg.up(asn):
+            self._up_interfaces.add(asn)
         else:
-            return 50000 + (remote_as % 10000)
+            self._up_interfaces.discard(asn)
 
     def _remove_peer(self, asn: int):
-        # Close firewall port
-        listen_port = self._calculate_listen_port(asn)
-        self.firewall.remove_port(listen_port)
+        """Remove a peer's interface and configs (the caller reconciles firewall ports)."""
+        self._peer_hash_cache.pop(asn, None)
+        self._peer_versions.pop(asn, None)
+        self._up_interfaces.discard(asn)
 
         self.wg.down(asn)
         self.wg.remove_interface(asn)
@@ -165,20 +425,42 @@ class SyncDaemon:
     async def run(self):
         self._running = True
         await self.sync_config()
-        counter = 0
+
+        # Absolute deadlines on the loop's monotonic clock: no drift from the
+        # time spent in each tick, and heartbeat/sync cadences are independent
+        loop = asyncio.get_running_loop()
+        next_heartbeat = loop.time() + self.heartbeat_interval
+        next_sync = loop.time() + self.sync_interval
+        next_mesh = loop.time() + MESH_RESYNC_INTERVAL
         while self._running:
-            await asyncio.sleep(self.heartbeat_interval)
-            counter += self.heartbeat_interval
-            await self.send_heartbeat()
-            if counter >= self.sync_interval:
-                await self.sync_config()
-                # Also sync mesh network periodically (retry failed tunnels)
-                if self.mesh_sync:
-                    try:
-                        await self.mesh_sync.sync_mesh()
-                    except Exception as e:
-                        logger.warning(f"Mesh sync failed: {e}")
-                counter = 0
+            await asyncio.sleep(max(0.0, min(next_heartbeat, next_sync) - loop.time()))
+            now = loop.time()
+
+            # Heartbeat and config fetch are independent; overlap their round trips
+            tasks = []
+            if now >= next_heartbeat:
+                tasks.append(self.send_heartbeat())
+                next_heartbeat = _next_deadline(next_heartbeat, self.heartbeat_interval, now)
+            sync_due = now >= next_sync
+            if sync_due:
+                tasks.append(self.sync_config())
+                next_sync = _next_deadline(next_sync, self.sync_interval, now)
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error(f"Sync tick failed: {result}")
+
+            # Mesh sync fetches the mesh config every sync tick but only
+            # applies it when it changed (or a previous apply failed); a full
+            # re-apply runs periodically as a safety net
+            if sync_due and self.mesh_sync:
+                resync = now >= next_mesh
+                try:
+                    await self.mesh_sync.sync_mesh(force=resync)
+                except Exception as e:
+                    logger.warning(f"Mesh sync failed: {e}")
+                if resync:
+                    next_mesh = now + MESH_RESYNC_INTERVAL
 
     async def stop(self):
         self._running = False
@@ -0,0 +1,166 @@
+"""
+MoeNet DN42 Agent - BIRD Executor Tests
+
+Tests for the BIRD control socket client and peer config writes.
+"""
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from services.bird import BirdExecutor  # noqa: E402
+
+SHOW_PROTOCOLS_REPLY = (
+    b"2002-Name       Proto      Table      State  Since         Info\n"
+    b"1002-dn42_4242420337 BGP        ---        up     2026-01-24    Established\n"
+    b" dn42_4242420919 BGP        ---        start  2026-01-24    Connect\n"
+    b" babel_igp  Babel      ---        up     2026-01-24\n"
+    b"0000 \n"
+)
+
+
+class FakeBird:
+    """Minimal BIRD control socket server answering canned replies."""
+
+    def __init__(self, path: Path, replies: dict):
+        self.path = str(path)
+        self.replies = replies
+        self.connections = 0
+        self.commands = []
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.path)
+        self.server.listen(4)
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            self.connections += 1
+            with conn, conn.makefile("rb") as f:
+                conn.sendall(b"0001 BIRD 2.15.1 ready.\n")
+                for line in f:
+                    cmd = line.decode().strip()
+                    self.commands.append(cmd)
+                    if cmd == "hangup":
+                        break
+                    conn.sendall(self.replies.get(cmd, b"9001 syntax error\n"))
+
+    def close(self):
+        self.server.close()
+
+
+@pytest.fixture
+def fake_bird(tmp_path):
+    bird = FakeBird(
+        tmp_path / "bird.ctl",
+        {
+            "show protocols": SHOW_PROTOCOLS_REPLY,
+            "configure": (
+                b"0002-Reading configuration from /etc/bird/bird.conf\n"
+                b"0003 Reconfigured\n"
+            ),
+        },
+    )
+    yield bird
+    bird.close()
+
+
+class TestBirdControlSocket:
+    """Tests for BirdExecutor talking to the BIRD control socket."""
+
+    def test_get_status_counts_protocols(self, fake_bird, tmp_path):
+        """Test get_status parses show protocols over the socket."""
+        executor = BirdExecutor(str(tmp_path / "peers"), fake_bird.path)
+
+        status = executor.get_status()
+
+        assert status == {"running": True, "protocols_up": 1, "protocols_down": 1}
+
+    def test_connection_is_reused(self, fake_bird, tmp_path):
+        """Test consecutive commands share one connection."""
+        executor = BirdExecutor(str(tmp_path / "peers"), fake_bird.path)
+
+        executor.get_status()
+        assert executor.reload_now() is True
+        executor.get_status()
+
+        assert fake_bird.connections == 1
+
+    def test_reconnects_after_disconnect(self, fake_bird, tmp_path):
+        """Test a dropped connection is reopened on the next command."""
+        executor = BirdExecutor(str(tmp_path / "peers"), fake_bird.path)
+        executor.get_status()
+
+        executor._sock.sendall(b"hangup\n")
+        status = executor.get_status()
+
+        assert status["running"] is True
+        assert fake_bird.connections == 2
+
+    def test_error_reply_fails_reload(self, tmp_path):
+        """Test an error code from BIRD reports the reload as failed."""
+        bird = FakeBird(tmp_path / "bird.ctl", {"configure": b"8002 bird.conf:3:1 syntax error\n"})
+        try:
+            executor = BirdExecutor(str(tmp_path / "peers"), bird.path)
+            assert executor.reload_now() is False
+        finally:
+            bird.close()
+
+    def test_unreachable_socket(self, tmp_path):
+        """Test missing control socket reports BIRD as not running."""
+        executor = BirdExecutor(str(tmp_path / "peers"), str(tmp_path / "missing.ctl"))
+
+        assert executor.get_status() == {"running": False}
+
+    def test_reload_requests_are_coalesced(self, fake_bird, tmp_path, monkeypatch):
+        """Test a burst of reload() calls results in a single configure."""
+        monkeypatch.setattr(BirdExecutor, "_coalesce_delay", 0.1)
+        executor = BirdExecutor(str(tmp_path / "peers"), fake_bird.path)
+
+        for _ in range(5):
+            executor.reload()
+        time.sleep(0.4)
+
+        assert fake_bird.commands.count("configure") == 1
+
+        executor.reload()
+        time.sleep(0.4)
+
+        assert fake_bird.commands.count("configure") == 2
+
+
+class TestWritePeers:
+    """Tests for BirdExecutor.write_peers."""
+
+    def test_writes_new_and_changed_configs(self, tmp_path):
+        """Test all configs in the batch end up on disk."""
+        executor = BirdExecutor(str(tmp_path / "peers"), str(tmp_path / "bird.ctl"))
+        (tmp_path / "peers").mkdir()
+        (tmp_path / "peers" / "dn42_4242420919.conf").write_text("old")
+
+        assert executor.write_peers({4242420337: "a", 4242420919: "b"}) is True
+
+        assert (tmp_path / "peers" / "dn42_4242420337.conf").read_text() == "a"
+        assert (tmp_path / "peers" / "dn42_4242420919.conf").read_text() == "b"
+
+    def test_identical_config_not_rewritten(self, tmp_path):
+        """Test an unchanged config file is left untouched."""
+        executor = BirdExecutor(str(tmp_path / "peers"), str(tmp_path / "bird.ctl"))
+        executor.write_peers({4242420337: "protocol bgp dn42_4242420337 {}\n"})
+        path = tmp_path / "peers" / "dn42_4242420337.conf"
+        os.utime(path, (0, 0))
+
+        executor.write_peers({4242420337: "protocol bgp dn42_4242420337 {}\n"})
+
+        assert path.stat().st_mtime == 0
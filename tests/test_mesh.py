@@ -0,0 +1,88 @@
+"""
+MoeNet DN42 Agent - Mesh Sync Tests
+
+Tests for MeshSync change detection and retry of failed tunnels.
+"""
+import sys
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from services.mesh import MeshSync  # noqa: E402
+
+MESH_CONFIG = {
+    "peers": [
+        {
+            "node_id": 1,
+            "name": "hk-edge",
+            "public_key": "cHVibGljMQ==",
+            "loopback": "fd00:4242:7777::1",
+            "endpoint": "hk.example.com",
+        },
+        {
+            "node_id": 2,
+            "name": "jp-edge",
+            "public_key": "cHVibGljMg==",
+            "loopback": "fd00:4242:7777::2",
+            "endpoint": "jp.example.com",
+        },
+    ]
+}
+
+
+@pytest.fixture
+def mesh(tmp_path):
+    """MeshSync with fake client/executors and no ip(8) calls."""
+    client = MagicMock()
+    client.get_mesh_config = AsyncMock(return_value=MESH_CONFIG)
+    client.register_mesh_key = AsyncMock()
+    wg = MagicMock()
+    wg.write_interface.return_value = True
+    wg.up_async = AsyncMock(return_value=True)
+    wg.get_status.return_value = {"interfaces": 0, "names": []}
+    bird = MagicMock()
+    bird.config_dir = str(tmp_path / "peers")
+
+    with (
+        patch("services.mesh.get_or_create_mesh_key", return_value=("cHJpdmF0ZQ==", "cHVi")),
+        patch.object(MeshSync, "_set_interface_mtu"),
+        patch.object(MeshSync, "_configure_interface_link_local"),
+    ):
+        yield MeshSync(client, wg, bird, node_id=3)
+
+
+class TestSyncMesh:
+    """Tests for MeshSync.sync_mesh."""
+
+    @pytest.mark.asyncio
+    async def test_unchanged_config_not_reapplied(self, mesh):
+        """Test an identical mesh config is only applied once."""
+        assert await mesh.sync_mesh() is True
+        assert await mesh.sync_mesh() is True
+
+        assert mesh.wg.up_async.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_force_reapplies(self, mesh):
+        """Test force re-applies an unchanged mesh config."""
+        await mesh.sync_mesh()
+        await mesh.sync_mesh(force=True)
+
+        assert mesh.wg.up_async.await_count == 4
+
+    @pytest.mark.asyncio
+    async def test_failed_tunnel_is_retried(self, mesh):
+        """Test a tunnel that failed to come up gets the config applied again."""
+        mesh.wg.up_async.side_effect = [True, False]
+        assert await mesh.sync_mesh() is False
+
+        mesh.wg.up_async.side_effect = None
+        assert await mesh.sync_mesh() is True
+
+        assert mesh.wg.up_async.await_count == 4
+        assert await mesh.sync_mesh() is True
+        assert mesh.wg.up_async.await_count == 4
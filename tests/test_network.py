@@ -0,0 +1,108 @@
+"""
+MoeNet DN42 Agent - Network Executor Tests
+
+Tests for firewall port reconciliation and loopback address derivation.
+"""
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from services.network import FirewallExecutor, LoopbackExecutor  # noqa: E402
+
+
+class FakeIptables:
+    """Per-family rule sets behind a fake subprocess.run for iptables tools."""
+
+    def __init__(self):
+        self.ports = {"iptables": set(), "ip6tables": set()}
+        self.failing = set()
+
+    def run(self, argv, input=None, **kwargs):
+        tool = argv[0] if isinstance(argv, list) else ""
+        if tool in self.ports and argv[1] == "-L":
+            lines = [
+                f"{i} ACCEPT udp -- 0.0.0.0/0 0.0.0.0/0 udp dpt:{port} /* moenet-dn42-{port} */"
+                for i, port in enumerate(sorted(self.ports[tool]), 1)
+            ]
+            return SimpleNamespace(returncode=0, stdout="\n".join(lines), stderr="")
+        if tool.endswith("-restore"):
+            family = tool.removesuffix("-restore")
+            if family in self.failing:
+                return SimpleNamespace(returncode=1, stdout="", stderr="failed")
+            for line in input.splitlines():
+                op, _, rest = line.partition(" ")
+                if op in ("-A", "-D"):
+                    port = int(rest.split("--dport ")[1].split()[0])
+                    if op == "-A":
+                        self.ports[family].add(port)
+                    else:
+                        self.ports[family].discard(port)
+        return SimpleNamespace(returncode=0, stdout="", stderr="")
+
+
+class TestSyncPorts:
+    """Tests for FirewallExecutor.sync_ports."""
+
+    def test_families_reconciled_independently(self):
+        """Test an IPv6 batch that failed is re-applied on the next sync."""
+        fake = FakeIptables()
+        fake.failing.add("ip6tables")
+        with patch("services.network.subprocess.run", side_effect=fake.run):
+            FirewallExecutor().sync_ports([30337, 30919])
+            assert fake.ports == {"iptables": {30337, 30919}, "ip6tables": set()}
+
+            fake.failing.clear()
+            FirewallExecutor().sync_ports([30337, 30919])
+
+        assert fake.ports == {"iptables": {30337, 30919}, "ip6tables": {30337, 30919}}
+
+    def test_stale_ports_removed_per_family(self):
+        """Test a port left only in one family is removed from that family."""
+        fake = FakeIptables()
+        fake.ports = {"iptables": {30337}, "ip6tables": {30337, 30919}}
+        with patch("services.network.subprocess.run", side_effect=fake.run):
+            result = FirewallExecutor().sync_ports([30337])
+
+        assert fake.ports == {"iptables": {30337}, "ip6tables": {30337}}
+        assert result == {"added": 0, "removed": 1}
+
+
+class TestSetupLoopback:
+    """Tests for LoopbackExecutor.setup_loopback."""
+
+    def _setup(self, node_id, existing):
+        executor = LoopbackExecutor()
+        with (
+            patch.object(LoopbackExecutor, "_interface_addresses", return_value=existing),
+            patch.object(LoopbackExecutor, "_apply_changes", return_value=True) as apply,
+        ):
+            assert executor.setup_loopback(node_id) is True
+        return apply.call_args.args[0] if apply.called else []
+
+    def test_ipv6_node_address_keeps_decimal_hextet(self):
+        """Test node 12 gets ::12 (not ::c), matching already deployed nodes."""
+        changes = self._setup(12, set())
+
+        assert changes == [
+            ("add", "172.22.188.12/32"),
+            ("add", "fd00:4242:7777::12/128"),
+        ]
+
+    def test_existing_addresses_are_kept(self):
+        """Test an already configured node is left alone."""
+        existing = {("172.22.188.12", 32), ("fd00:4242:7777::12", 128)}
+
+        assert self._setup(12, existing) == []
+
+    def test_stale_node_address_is_removed(self):
+        """Test addresses from a previous node_id are deleted."""
+        existing = {("172.22.188.3", 32), ("fd00:4242:7777::3", 128)}
+
+        changes = self._setup(12, existing)
+
+        assert ("del", "172.22.188.3/32") in changes
+        assert ("del", "fd00:4242:7777::3/128") in changes
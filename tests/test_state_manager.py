@@ -0,0 +1,55 @@
+"""
+MoeNet DN42 Agent - State Manager Tests
+
+Tests for when last_state.json is written.
+"""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from state.manager import StateManager  # noqa: E402
+
+
+@pytest.fixture
+def state(tmp_path):
+    manager = StateManager(str(tmp_path / "last_state.json"))
+    yield manager
+    # Flush and cancel any pending save timer
+    manager.save()
+
+
+def read_state(manager: StateManager) -> dict:
+    return json.loads(manager.state_path.read_text())
+
+
+class TestStateManager:
+    """Tests for immediate and debounced state writes."""
+
+    def test_applied_config_written_immediately(self, state):
+        """Test applied config and config_seq reach disk without waiting for the timer."""
+        state.update_applied_config([{"asn": 4242420337}], "blake2b:abc")
+        state.set_applied_seq(7)
+
+        on_disk = read_state(state)
+        assert on_disk["config_version_hash"] == "blake2b:abc"
+        assert on_disk["applied_config"]["peers"] == [{"asn": 4242420337}]
+        assert on_disk["config_seq"] == 7
+        assert state._save_timer is None
+
+    def test_health_updates_are_debounced(self, state):
+        """Test health updates wait on a daemon timer until save()."""
+        state.set_node_id("hk-edge")
+        state.update_health({"running": True})
+
+        assert "running" not in read_state(state)["health_status"]
+        assert state._save_timer.daemon is True
+
+        state.save()
+
+        assert read_state(state)["health_status"]["running"] is True
+        assert state._save_timer is None
@@ -0,0 +1,308 @@
+"""
+MoeNet DN42 Agent - Sync Daemon Tests
+
+Tests for SyncDaemon.sync_config against fake executors.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import workers.sync_daemon as sync_daemon  # noqa: E402
+from state.manager import StateManager  # noqa: E402
+from workers.sync_daemon import SyncDaemon  # noqa: E402
+
+
+class FakeClient:
+    """Control-plane client returning a settable config."""
+
+    def __init__(self, config: dict):
+        self.config = config
+
+    async def get_config(self):
+        return self.config
+
+
+class FakeWireGuard:
+    """WireGuardExecutor writing configs to a directory, with no interfaces."""
+
+    def __init__(self, config_dir: Path):
+        self.config_dir = config_dir
+        self.private_key = "cHJpdmF0ZQ=="
+        self.fail_writes = False
+        self.up_calls = []
+        self.down_calls = []
+
+    def write_interface(self, asn, config: str) -> bool:
+        if self.fail_writes:
+            return False
+        (self.config_dir / f"dn42-{asn}.conf").write_text(config)
+        return True
+
+    def up(self, asn) -> bool:
+        self.up_calls.append(asn)
+        return True
+
+    def down(self, asn) -> bool:
+        self.down_calls.append(asn)
+        return True
+
+    def remove_interface(self, asn) -> bool:
+        (self.config_dir / f"dn42-{asn}.conf").unlink(missing_ok=True)
+        return True
+
+
+class FakeBird:
+    """BirdExecutor writing peer configs to a directory and counting reloads."""
+
+    def __init__(self, config_dir: Path):
+        self.config_dir = config_dir
+        self.fail_writes = False
+        self.reloads = 0
+
+    def write_peers(self, configs: dict) -> bool:
+        if self.fail_writes:
+            return False
+        for asn, config in configs.items():
+            (self.config_dir / f"dn42_{asn}.conf").write_text(config)
+        return True
+
+    def remove_peer(self, asn: int) -> bool:
+        (self.config_dir / f"dn42_{asn}.conf").unlink(missing_ok=True)
+        return True
+
+    def reload(self) -> bool:
+        self.reloads += 1
+        return True
+
+
+class FakeFirewall:
+    """FirewallExecutor recording the wanted port sets."""
+
+    def __init__(self):
+        self.synced = []
+
+    def sync_ports(self, expected_ports):
+        self.synced.append(expected_ports)
+        return {"added": 0, "removed": 0}
+
+
+class CountingDaemon(SyncDaemon):
+    """SyncDaemon with trivial templates that records which peers get rendered."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rendered = []
+
+    def _render_peers(self, peers):
+        self.rendered.append(sorted(p["asn"] for p in peers))
+        return [
+            (f"wg {p['asn']} {p['tunnel']['public_key']}\n", f"bgp {p['asn']}\n") for p in peers
+        ]
+
+
+def make_peer(asn: int, public_key: str = "key", version: int = 1, **extra) -> dict:
+    return {
+        "asn": asn,
+        "version": version,
+        "tunnel": {"type": "wireguard", "public_key": public_key},
+        "bgp": {},
+        **extra,
+    }
+
+
+@pytest.fixture(autouse=True)
+def no_sysfs(monkeypatch):
+    """Treat every interface as down: there are no real links in tests."""
+    monkeypatch.setattr(sync_daemon, "interface_is_up", lambda name: False)
+
+
+@pytest.fixture
+def env(tmp_path):
+    """Fake executors and a state file in a temp directory."""
+    (tmp_path / "wg").mkdir()
+    (tmp_path / "bird").mkdir()
+    env = type("Env", (), {})()
+    env.path = tmp_path
+    env.client = FakeClient({"peers": []})
+    env.wg = FakeWireGuard(tmp_path / "wg")
+    env.bird = FakeBird(tmp_path / "bird")
+    env.firewall = FakeFirewall()
+    env.state = StateManager(str(tmp_path / "last_state.json"))
+    yield env
+    # Flush and cancel any pending save timer
+    env.state.save()
+
+
+def make_daemon(env) -> CountingDaemon:
+    return CountingDaemon(
+        client=env.client,
+        state_manager=env.state,
+        bird_executor=env.bird,
+        wg_executor=env.wg,
+        firewall_executor=env.firewall,
+    )
+
+
+class TestSyncConfig:
+    """Tests for adding, updating and removing peers."""
+
+    @pytest.mark.asyncio
+    async def test_add_update_remove(self, env):
+        """Test peers are written, rewritten on change and torn down on removal."""
+        daemon = make_daemon(env)
+        env.client.config = {"peers": [make_peer(4242420337), make_peer(4242420919)]}
+
+        assert await daemon.sync_config() is True
+
+        assert (env.wg.config_dir / "dn42-4242420337.conf").read_text() == "wg 4242420337 key\n"
+        assert (env.bird.config_dir / "dn42_4242420919.conf").read_text() == "bgp 4242420919\n"
+        assert env.bird.reloads == 1
+
+        env.client.config = {
+            "peers": [make_peer(4242420337, "new", version=2), make_peer(4242420919)]
+        }
+        await daemon.sync_config()
+
+        assert daemon.rendered[-1] == [4242420337]
+        assert (env.wg.config_dir / "dn42-4242420337.conf").read_text() == "wg 4242420337 new\n"
+
+        env.client.config = {"peers": [make_peer(4242420919)]}
+        await daemon.sync_config()
+
+        assert env.state.get_applied_peers() == env.client.config["peers"]
+        assert env.wg.down_calls == [4242420337]
+        assert not (env.wg.config_dir / "dn42-4242420337.conf").exists()
+        assert not (env.bird.config_dir / "dn42_4242420337.conf").exists()
+
+    @pytest.mark.asyncio
+    async def test_unchanged_config(self, env):
+        """Test an identical config doesn't reload BIRD again."""
+        daemon = make_daemon(env)
+        env.client.config = {"peers": [make_peer(4242420337)]}
+        await daemon.sync_config()
+        config_hash = env.state.get_config_hash()
+
+        assert await daemon.sync_config() is True
+
+        assert env.state.get_config_hash() == config_hash
+        assert env.bird.reloads == 1
+
+    @pytest.mark.asyncio
+    async def test_no_config(self, env):
+        """Test a missing config is reported as a failed sync."""
+        env.client.config = None
+
+        assert await make_daemon(env).sync_config() is False
+
+
+class TestFailedWrites:
+    """Tests for peers whose config write failed being retried."""
+
+    @pytest.mark.asyncio
+    async def test_failed_wg_write_is_retried(self, env):
+        """Test a peer whose WireGuard write failed is re-processed next sync."""
+        daemon = make_daemon(env)
+        env.client.config = {"config_seq": 1, "peers": [make_peer(4242420337)]}
+        env.wg.fail_writes = True
+        await daemon.sync_config()
+        assert not (env.wg.config_dir / "dn42-4242420337.conf").exists()
+
+        env.wg.fail_writes = False
+        await daemon.sync_config()
+
+        assert daemon.rendered[-1] == [4242420337]
+        assert (env.wg.config_dir / "dn42-4242420337.conf").exists()
+
+    @pytest.mark.asyncio
+    async def test_failed_bird_write_is_retried(self, env):
+        """Test a peer whose BIRD write failed is re-processed next sync."""
+        daemon = make_daemon(env)
+        env.client.config = {"config_seq": 1, "peers": [make_peer(4242420337)]}
+        env.bird.fail_writes = True
+        await daemon.sync_config()
+        assert not (env.bird.config_dir / "dn42_4242420337.conf").exists()
+
+        env.bird.fail_writes = False
+        await daemon.sync_config()
+
+        assert daemon.rendered[-1] == [4242420337]
+        assert (env.bird.config_dir / "dn42_4242420337.conf").read_text() == "bgp 4242420337\n"
+
+
+class TestSkipUnchanged:
+    """Tests for skipping peers via config_seq and per-peer versions."""
+
+    @pytest.mark.asyncio
+    async def test_same_seq_skips_rendering(self, env):
+        """Test an unchanged config_seq renders nothing but keeps tunnels up."""
+        daemon = make_daemon(env)
+        env.client.config = {"config_seq": 7, "peers": [make_peer(4242420337)]}
+        await daemon.sync_config()
+
+        await daemon.sync_config()
+
+        assert daemon.rendered == [[4242420337], []]
+        assert env.wg.up_calls == [4242420337, 4242420337]
+
+    @pytest.mark.asyncio
+    async def test_persisted_seq_not_trusted_after_restart(self, env):
+        """Test the first sync of a new process renders every peer."""
+        env.client.config = {"config_seq": 7, "peers": [make_peer(4242420337)]}
+        await make_daemon(env).sync_config()
+
+        daemon = make_daemon(env)
+        await daemon.sync_config()
+
+        assert daemon.rendered == [[4242420337]]
+
+    @pytest.mark.asyncio
+    async def test_peer_version_skip(self, env):
+        """Test only peers with a new version are rendered without a config_seq."""
+        daemon = make_daemon(env)
+        env.client.config = {"peers": [make_peer(4242420337), make_peer(4242420919)]}
+        await daemon.sync_config()
+
+        env.client.config = {"peers": [make_peer(4242420337), make_peer(4242420919, version=2)]}
+        await daemon.sync_config()
+
+        assert daemon.rendered[-1] == [4242420919]
+
+
+class TestFirewall:
+    """Tests for the batched firewall reconcile."""
+
+    @pytest.mark.asyncio
+    async def test_sync_ports_gets_full_port_set(self, env):
+        """Test sync_ports receives every current tunnel's port, not just changed ones."""
+        daemon = make_daemon(env)
+        env.client.config = {
+            "peers": [
+                make_peer(4242420337),
+                make_peer(4242420919, listen_port=20919),
+                make_peer(4201270005),
+            ]
+        }
+        await daemon.sync_config()
+        assert env.firewall.synced == [[20919, 30337, 40005]]
+
+        env.client.config = {
+            "peers": [make_peer(4242420337, "new", version=2), make_peer(4201270005)]
+        }
+        await daemon.sync_config()
+
+        assert env.firewall.synced[-1] == [30337, 40005]
+
+    @pytest.mark.asyncio
+    async def test_unchanged_sync_leaves_firewall_alone(self, env):
+        """Test a sync without tunnel changes doesn't touch iptables."""
+        daemon = make_daemon(env)
+        env.client.config = {"peers": [make_peer(4242420337)]}
+        await daemon.sync_config()
+
+        await daemon.sync_config()
+
+        assert len(env.firewall.synced) == 1
@@ -0,0 +1,138 @@
+"""
+MoeNet DN42 Agent - WireGuard Executor Tests
+
+Tests for WireGuard config parsing, key generation and interface bring-up.
+"""
+import base64
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from core.wgkeys import derive_public_key, generate_private_key  # noqa: E402
+from services.wireguard import WireGuardExecutor, _split_wg_config  # noqa: E402
+
+WG_CONFIG = """# WireGuard Interface: dn42-4242420337
+
+[Interface]
+PrivateKey = cHJpdmF0ZQ==
+Address = fe80::998/64, 172.22.188.2/32
+ListenPort = 30337
+
+[Peer]
+PublicKey = cHVibGlj
+Endpoint = peer.example.com:20998
+AllowedIPs = 0.0.0.0/0, fd00::/8, fe80::/64
+PersistentKeepalive = 25
+"""
+
+
+@pytest.fixture
+def wg_executor(tmp_path):
+    """WireGuardExecutor with a pre-existing key pair (no wg binary needed)."""
+    (tmp_path / "private.key").write_text("cHJpdmF0ZQ==")
+    (tmp_path / "private.pub").write_text("cHVibGlj")
+    return WireGuardExecutor(str(tmp_path))
+
+
+class TestSplitConfig:
+    """Tests for the single-pass WireGuard config parser."""
+
+    def test_interface_settings_and_peer_section(self):
+        """Test [Interface] keys are parsed and [Peer] is returned verbatim."""
+        settings, peer_config = _split_wg_config(WG_CONFIG)
+
+        assert settings == {
+            "PrivateKey": "cHJpdmF0ZQ==",
+            "Address": "fe80::998/64, 172.22.188.2/32",
+            "ListenPort": "30337",
+        }
+        assert peer_config.startswith("[Peer]\nPublicKey = cHVibGlj")
+        assert peer_config.endswith("PersistentKeepalive = 25\n")
+
+    def test_no_peer_section(self):
+        """Test a config without [Peer] has no peer section."""
+        _, peer_config = _split_wg_config("[Interface]\nListenPort = 1\n")
+
+        assert peer_config is None
+
+
+class TestUp:
+    """Tests for WireGuardExecutor.up / up_async."""
+
+    def test_up_steps_new_interface(self, wg_executor):
+        """Test a new interface is created, configured and addressed."""
+        wg_executor.write_interface(4242420337, WG_CONFIG)
+
+        with patch("services.wireguard.interface_exists", return_value=False), patch(
+            "services.wireguard.interface_is_up", return_value=False
+        ):
+            steps = wg_executor._up_steps("dn42-4242420337")
+
+        argvs = [argv for argv, _, _ in steps]
+        assert argvs == [
+            ["ip", "-batch", "-"],
+            ["wg", "setconf", "dn42-4242420337", "/dev/stdin"],
+            ["ip", "-force", "-batch", "-"],
+        ]
+        assert steps[0][1] == (
+            "link add dn42-4242420337 type wireguard\n"
+            "link set mtu 1420 up dev dn42-4242420337\n"
+        )
+        assert steps[1][1] == (
+            "[Interface]\nPrivateKey = cHJpdmF0ZQ==\nListenPort = 30337\n\n"
+            + WG_CONFIG[WG_CONFIG.index("[Peer]") :]
+        )
+        assert steps[2][1] == (
+            "addr add fe80::998/64 dev dn42-4242420337\n"
+            "addr add 172.22.188.2/32 dev dn42-4242420337\n"
+        )
+
+    def test_up_steps_existing_interface(self, wg_executor):
+        """Test an existing, up interface skips the ip batch."""
+        wg_executor.write_interface(4242420337, WG_CONFIG)
+
+        with patch("services.wireguard.interface_exists", return_value=True), patch(
+            "services.wireguard.interface_is_up", return_value=True
+        ):
+            steps = wg_executor._up_steps("dn42-4242420337")
+
+        assert steps[0][0][:2] == ["wg", "setconf"]
+
+    @pytest.mark.asyncio
+    async def test_up_async_stops_on_failure(self, wg_executor):
+        """Test up_async reports failure when a checked step fails."""
+        wg_executor.write_interface(4242420337, WG_CONFIG)
+        steps = [(["true"], None, True), (["false"], "input", True), (["true"], None, True)]
+
+        with patch.object(WireGuardExecutor, "_up_steps", return_value=steps):
+            assert await wg_executor.up_async(4242420337) is False
+
+        with patch.object(WireGuardExecutor, "_up_steps", return_value=steps[:1]):
+            assert await wg_executor.up_async(4242420337) is True
+
+
+class TestKeyGeneration:
+    """Tests for in-process WireGuard key generation."""
+
+    def test_private_key_is_clamped(self):
+        """Test generated keys are 32 bytes with Curve25519 clamping."""
+        raw = base64.b64decode(generate_private_key())
+
+        assert len(raw) == 32
+        assert raw[0] & 7 == 0
+        assert raw[31] & 0xC0 == 0x40
+
+    def test_public_key_rfc7748_vector(self):
+        """Test public key derivation against the RFC 7748 test vector."""
+        pytest.importorskip("cryptography")
+        private = bytes.fromhex("77076d0a7318a57d3c16c17251b26645df4c2f87ebc0992ab177fba51db92c2a")
+        public = bytes.fromhex("8520f0098930a754748b7ddcb43ef75a0dbf3a0d26381af4eba4a98eaa9b4e6a")
+
+        assert derive_public_key(base64.b64encode(private).decode()) == (
+            base64.b64encode(public).decode()
+        )